@@ -1,18 +1,29 @@
 import os
+import sys
 import json
 import base64
 import hashlib
 import secrets
 import html
+import asyncio
 import smtplib
 import ssl as _ssl
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from concurrent.futures import TimeoutError as FuturesTimeout
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from io import BytesIO
+from urllib.parse import urlparse
 from typing import List, Dict, Optional, Tuple, Callable
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import yfinance as yf
 import pandas as pd
 import numpy as np
@@ -20,6 +31,8 @@ import plotly.express as px
 import streamlit as st
 from sqlalchemy import create_engine, text
 
+from fantazia_scoring import FantaziaScorer, IncrementalMetrics
+
 DB_URL = st.secrets.get("DB_URL", "").strip()
 
 @st.cache_resource
@@ -313,6 +326,13 @@ try:
 except Exception:
     HAVE_REPORTLAB = False
 
+# Optionnel : stockage colonnaire (Parquet) pour le price store
+try:
+    import pyarrow  # noqa: F401
+    HAVE_PARQUET = True
+except Exception:
+    HAVE_PARQUET = False
+
 
 # =========================================================
 # PAGE CONFIG
@@ -369,6 +389,9 @@ TRANSLATIONS = {
         "sidebar_history": "Historique à charger",
         "sidebar_auto_adjust": "Prix ajustés",
         "sidebar_source": "Source historique (fallback par action)",
+        "sidebar_hedging": "Requêtes couvertes (mode Auto)",
+        "sidebar_hedging_help": "Si un provider tarde au-delà de sa latence habituelle, le suivant est interrogé en parallèle et la première réponse valide est gardée (consomme un peu plus de quota).",
+        "sidebar_paused": "⏸️ En pause (quota atteint) : {providers}",
         "sidebar_rt": "Activer prix temps réel (Premium Polygon)",
         "sidebar_refresh": "Auto-refresh (optionnel)",
         "sidebar_no_tickers": "Aucun ticker sélectionné.",
@@ -376,6 +399,7 @@ TRANSLATIONS = {
         "sidebar_api_none": "Aucune clé API détectée : mode Auto = Finnhub uniquement.",
         "sidebar_benchmark": "Benchmark (indice de référence)",
         "tab_dashboard": "📊 Dashboard",
+        "tab_screener": "🔎 Screener",
         "tab_watchlists": "⭐ Watchlists",
         "tab_simulator": "💼 Simulateur",
         "tab_stock": "📄 Fiche action",
@@ -501,6 +525,32 @@ TRANSLATIONS = {
         "assistant_title": "🤖 Assistant Fantazia (FAQ)",
         "assistant_caption": "Posez vos questions sur le fonctionnement du site : Fantazia Score, graphiques, watchlists, alertes, simulateur, benchmark, corrélation, news, etc.",
         "assistant_input": "Votre question sur Fantazia Finance...",
+        "missing_history": "Aucun historique pour : {tickers}",
+        "missing_unknown_ticker": "ticker inconnu",
+        "missing_reason_unknown": "symbole inconnu",
+        "missing_reason_timeout": "délai dépassé",
+        "missing_reason_error": "erreur",
+        "scr_limit_reached": "🔒 Vous avez atteint la limite de **10 analyses par jour** pour les comptes gratuits.",
+        "scr_premium_gate": "Avec un compte Premium, classez des univers complets sans limite d'analyses.",
+        "scr_title": "🔎 Screener — univers complet",
+        "scr_no_universe": "Aucun univers disponible : déposez un fichier de constituants (CSV avec une colonne `ticker`) dans le dossier `{dir}/`.",
+        "scr_universe": "Univers",
+        "scr_period": "Historique",
+        "scr_top_n": "Top N",
+        "scr_bad_file": "Fichier de constituants illisible ou sans colonne ticker.",
+        "scr_universe_caption": "{n} tickers dans l'univers · historiques Yahoo en bulk, mis en cache.",
+        "scr_run": "▶️ Lancer le screener",
+        "scr_run_hint": "Lancez le screener pour classer l'univers.",
+        "scr_no_history": "Impossible de charger l'historique de cet univers.",
+        "scr_coverage": "Historique : {prices}/{universe} · Fondamentaux : {fundamentals}/{prices} (les manquants se complètent aux prochains passages, selon le quota Finnhub).",
+        "scr_sectors": "Secteurs",
+        "scr_min_cap": "Market Cap min (Mds)",
+        "scr_max_pe": "P/E max (0 = sans limite)",
+        "scr_min_perf": "Perf 1Y min (%)",
+        "scr_fund_only": "Uniquement avec fondamentaux",
+        "scr_no_match": "Aucun titre ne passe les filtres.",
+        "scr_result_caption": "{n} titres après filtres · Fantazia Score (%) relatif à tout l'univers · performances, vol et drawdown en %.",
+        "scr_csv_gate": "Avec un compte Premium, exportez le classement du screener en CSV.",
     },
     "en": {
         "app_title": "Fantazia Finance",
@@ -540,6 +590,9 @@ TRANSLATIONS = {
         "sidebar_history": "History to load",
         "sidebar_auto_adjust": "Adjusted prices",
         "sidebar_source": "Historical source (per-stock fallback)",
+        "sidebar_hedging": "Hedged requests (Auto mode)",
+        "sidebar_hedging_help": "If a provider is slower than its usual latency, the next one is queried in parallel and the first valid answer is kept (uses a bit more quota).",
+        "sidebar_paused": "⏸️ Paused (quota reached): {providers}",
         "sidebar_rt": "Enable real-time prices (Premium Polygon)",
         "sidebar_refresh": "Auto-refresh (optional)",
         "sidebar_no_tickers": "No ticker selected.",
@@ -547,6 +600,7 @@ TRANSLATIONS = {
         "sidebar_api_none": "No API key detected: Auto mode = Finnhub only.",
         "sidebar_benchmark": "Benchmark (reference index)",
         "tab_dashboard": "📊 Dashboard",
+        "tab_screener": "🔎 Screener",
         "tab_watchlists": "⭐ Watchlists",
         "tab_simulator": "💼 Simulator",
         "tab_stock": "📄 Stock sheet",
@@ -672,6 +726,32 @@ TRANSLATIONS = {
         "assistant_title": "🤖 Fantazia Assistant (FAQ)",
         "assistant_caption": "Ask questions about how the site works: Fantazia Score, charts, watchlists, alerts, simulator, benchmark, correlation, news, etc.",
         "assistant_input": "Your question about Fantazia Finance...",
+        "missing_history": "No history for: {tickers}",
+        "missing_unknown_ticker": "unknown ticker",
+        "missing_reason_unknown": "unknown symbol",
+        "missing_reason_timeout": "timed out",
+        "missing_reason_error": "error",
+        "scr_limit_reached": "🔒 You have reached the limit of **10 analyses per day** for free accounts.",
+        "scr_premium_gate": "With a Premium account, rank full universes with no analysis limit.",
+        "scr_title": "🔎 Screener — full universe",
+        "scr_no_universe": "No universe available: drop a constituents file (CSV with a `ticker` column) into the `{dir}/` folder.",
+        "scr_universe": "Universe",
+        "scr_period": "History",
+        "scr_top_n": "Top N",
+        "scr_bad_file": "Constituents file unreadable or without a ticker column.",
+        "scr_universe_caption": "{n} tickers in the universe · Yahoo histories loaded in bulk, cached.",
+        "scr_run": "▶️ Run the screener",
+        "scr_run_hint": "Run the screener to rank the universe.",
+        "scr_no_history": "Unable to load the history of this universe.",
+        "scr_coverage": "History: {prices}/{universe} · Fundamentals: {fundamentals}/{prices} (missing ones are filled in on later runs, depending on the Finnhub quota).",
+        "scr_sectors": "Sectors",
+        "scr_min_cap": "Min Market Cap (bn)",
+        "scr_max_pe": "Max P/E (0 = no limit)",
+        "scr_min_perf": "Min 1Y perf (%)",
+        "scr_fund_only": "Only with fundamentals",
+        "scr_no_match": "No stock passes the filters.",
+        "scr_result_caption": "{n} stocks after filters · Fantazia Score (%) relative to the whole universe · performance, vol and drawdown in %.",
+        "scr_csv_gate": "With a Premium account, export the screener ranking to CSV.",
     },
 }
 
@@ -2498,113 +2578,529 @@ def perf_color(val):
     return ""
 
 
-def safe_numeric(df, col):
-    return pd.to_numeric(df.get(col), errors="coerce")
-
-
-def zscore(s: pd.Series):
-    s = s.astype(float)
-    s_clean = s.dropna()
-    if s_clean.empty:
-        return s * np.nan
-    std = s_clean.std(ddof=0)
-    if std == 0 or np.isnan(std):
-        return s * 0
-    return (s - s_clean.mean()) / std
-
-
-def rolling_return(prices: pd.DataFrame, days: int):
-    if prices.empty or len(prices) <= days:
-        return pd.Series(index=prices.columns, dtype=float)
-    return prices.iloc[-1] / prices.iloc[-days] - 1.0
-
-
-def calendar_return_years(prices: pd.DataFrame, years: int = 1):
-    if prices.empty:
-        return pd.Series(index=prices.columns, dtype=float)
-    out = {}
-    last_date = prices.index[-1]
-    target_date = last_date - pd.DateOffset(years=years)
-    for col in prices.columns:
-        s = prices[col].dropna()
-        if s.empty:
-            out[col] = np.nan
-            continue
-        s_after = s.loc[s.index >= target_date]
-        if s_after.empty:
-            out[col] = np.nan
-            continue
-        start = s_after.iloc[0]
-        end = s.iloc[-1]
-        out[col] = (end / start) - 1.0
-    return pd.Series(out)
-
-
-def annualized_vol(prices: pd.DataFrame):
-    if prices.empty or len(prices) < 20:
-        return pd.Series(index=prices.columns, dtype=float)
-    rets = prices.pct_change().dropna()
-    return rets.std() * np.sqrt(252)
-
-
-def max_drawdown(prices: pd.DataFrame):
-    if prices.empty:
-        return pd.Series(index=prices.columns, dtype=float)
-    dd = {}
-    for col in prices.columns:
-        s = prices[col].dropna()
-        if s.empty:
-            dd[col] = np.nan
-            continue
-        cummax = s.cummax()
-        draw = (s / cummax) - 1.0
-        dd[col] = draw.min()
-    return pd.Series(dd)
-
-
 def normalize_cols(df: pd.DataFrame):
     df = df.copy()
     df.columns = [str(c).strip().upper() for c in df.columns]
     return df
 
 
+def period_offset(period: str):
+    """Profondeur d'historique de la période (Timedelta / DateOffset), None = tout."""
+    return {
+        "1d": pd.Timedelta(days=1),
+        "5d": pd.Timedelta(days=5),
+        "1mo": pd.DateOffset(months=1),
+        "3mo": pd.DateOffset(months=3),
+        "1y": pd.DateOffset(years=1),
+        "3y": pd.DateOffset(years=3),
+        "5y": pd.DateOffset(years=5),
+    }.get(period)
+
+
 def filter_period_series(s: pd.Series, period: str) -> pd.Series:
     if s is None or s.empty:
         return pd.Series(dtype=float)
     s = s.sort_index()
-    last_date = s.index.max()
-    start = None
-    if period == "1d":
-        start = last_date - pd.Timedelta(days=1)
-    elif period == "5d":
-        start = last_date - pd.Timedelta(days=5)
-    elif period == "1mo":
-        start = last_date - pd.DateOffset(months=1)
-    elif period == "3mo":
-        start = last_date - pd.DateOffset(months=3)
-    elif period == "1y":
-        start = last_date - pd.DateOffset(years=1)
-    elif period == "3y":
-        start = last_date - pd.DateOffset(years=3)
-    elif period == "5y":
-        start = last_date - pd.DateOffset(years=5)
-    if start is not None:
-        s = s.loc[s.index >= start]
+    offset = period_offset(period)
+    if offset is not None:
+        s = s.loc[s.index >= s.index.max() - offset]
     return s
 
 
 def filter_period_df(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    # chaque colonne est coupée depuis SA dernière date valide
     if df.empty:
         return df
-    out = []
-    for col in df.columns:
-        s = df[col].dropna()
-        s = filter_period_series(s, period)
-        if not s.empty:
-            out.append(s.rename(col))
-    if not out:
+    df = df.sort_index()
+    values = df.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    has = valid.any(axis=0)
+    last = valid.shape[0] - 1 - valid[::-1].argmax(axis=0)
+    keep = valid.copy()
+    offset = period_offset(period)
+    if offset is not None and has.any():
+        last_dates = pd.DatetimeIndex(df.index[last[has]])
+        starts = (last_dates - offset).values
+        keep[:, has] &= df.index.values[:, None] >= starts[None, :]
+    cols = keep.any(axis=0)
+    if not cols.any():
         return pd.DataFrame()
-    return pd.concat(out, axis=1).dropna(how="all")
+    out = pd.DataFrame(np.where(keep, values, np.nan)[:, cols], index=df.index, columns=df.columns[cols])
+    return out.dropna(how="all")
+
+
+# =========================================================
+# METRICS ENGINE (moteur headless : fantazia_scoring)
+# =========================================================
+def session_price_metrics(prices: pd.DataFrame) -> pd.DataFrame:
+    """Métriques de la session, mises à jour en O(tickers) si seule la dernière barre change."""
+    inc = st.session_state.get("_inc_metrics")
+    if inc is None:
+        st.session_state["_inc_metrics"] = IncrementalMetrics(prices)
+    else:
+        inc.sync(prices)
+    return st.session_state["_inc_metrics"].metrics()
+
+
+# =========================================================
+# PROVIDER HEALTH (circuit breaker)
+# =========================================================
+class CircuitBreaker:
+    """
+    Disjoncteur partagé par provider (tout le process, toutes sessions).
+    closed -> open après `max_failures` 429/timeouts consécutifs,
+    open -> half-open après `cooldown_s` (une seule requête sonde),
+    half-open -> closed si la sonde passe, sinon re-open.
+    """
+
+    def __init__(self, max_failures: int = 3, cooldown_s: float = 60.0):
+        self.max_failures = max_failures
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict] = {}
+
+    def _get(self, provider: str) -> Dict:
+        return self._state.setdefault(provider, {"failures": 0, "opened_at": None, "probing": False})
+
+    def is_open(self, provider: str) -> bool:
+        with self._lock:
+            ps = self._get(provider)
+            if ps["opened_at"] is None:
+                return False
+            return ps["probing"] or time.monotonic() - ps["opened_at"] < self.cooldown_s
+
+    def allow(self, provider: str) -> bool:
+        with self._lock:
+            ps = self._get(provider)
+            if ps["opened_at"] is None:
+                return True
+            if ps["probing"] or time.monotonic() - ps["opened_at"] < self.cooldown_s:
+                return False
+            ps["probing"] = True
+            return True
+
+    def record_success(self, provider: str) -> None:
+        with self._lock:
+            self._state[provider] = {"failures": 0, "opened_at": None, "probing": False}
+
+    def record_failure(self, provider: str) -> None:
+        with self._lock:
+            ps = self._get(provider)
+            ps["failures"] += 1
+            if ps["probing"] or ps["failures"] >= self.max_failures:
+                ps["opened_at"] = time.monotonic()
+            ps["probing"] = False
+
+    def release(self, provider: str) -> None:
+        # sonde terminée sans verdict (erreur non liée au quota)
+        with self._lock:
+            self._get(provider)["probing"] = False
+
+    def open_providers(self) -> List[str]:
+        return [p for p in list(self._state.keys()) if self.is_open(p)]
+
+
+@st.cache_resource
+def get_circuit_breaker() -> CircuitBreaker:
+    return CircuitBreaker(max_failures=3, cooldown_s=60.0)
+
+
+class ProviderLatency:
+    """Latences récentes des réponses valides, par provider (fenêtre glissante)."""
+
+    def __init__(self, window: int = 50, min_samples: int = 5):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, provider: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(provider, deque(maxlen=self.window)).append(float(seconds))
+
+    def quantile(self, provider: str, q: float = 0.9) -> Optional[float]:
+        with self._lock:
+            samples = list(self._samples.get(provider, []))
+        if len(samples) < self.min_samples:
+            return None
+        return float(np.quantile(samples, q))
+
+
+@st.cache_resource
+def get_provider_latency() -> ProviderLatency:
+    return ProviderLatency()
+
+
+# Cache négatif : un couple (ticker, provider) en échec n'est pas réinterrogé
+# avant expiration. Symbole inconnu (le provider l'a dit explicitement) : long ;
+# délai dépassé / erreur (réponse vide sans explication) : court.
+NEGATIVE_TTL_S = {"unknown": 30 * 60, "timeout": 3 * 60, "error": 3 * 60}
+# Au-delà, une réponse vide est considérée comme un délai dépassé
+NEGATIVE_SLOW_S = 10.0
+
+
+class NegativeCache:
+    """Échecs récents par (ticker, provider), avec leur raison et leur expiration."""
+
+    def __init__(self, ttl_s: Optional[Dict[str, float]] = None):
+        self.ttl_s = dict(ttl_s or NEGATIVE_TTL_S)
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, str], Tuple[str, float]] = {}
+
+    def record(self, ticker: str, provider: str, reason: str) -> None:
+        # provider en pause (disjoncteur) : l'échec ne dit rien du ticker
+        if get_circuit_breaker().is_open(provider):
+            return
+        expires = time.monotonic() + self.ttl_s.get(reason, self.ttl_s["error"])
+        with self._lock:
+            self._entries[(ticker.upper(), provider)] = (reason, expires)
+
+    def lookup(self, ticker: str, provider: str) -> Optional[str]:
+        key = (ticker.upper(), provider)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[0]
+
+    def clear(self, ticker: str, provider: str) -> None:
+        with self._lock:
+            self._entries.pop((ticker.upper(), provider), None)
+
+    def reasons(self, ticker: str) -> Dict[str, str]:
+        now = time.monotonic()
+        t = ticker.upper()
+        with self._lock:
+            return {p: r for (tk, p), (r, exp) in self._entries.items() if tk == t and exp > now}
+
+
+@st.cache_resource
+def get_negative_cache() -> NegativeCache:
+    return NegativeCache()
+
+
+# Symboles explicitement refusés par le provider pendant l'appel en cours
+# (même thread) : seule preuve qu'une réponse vide veut dire "inconnu"
+_symbol_not_found = threading.local()
+
+
+def note_symbol_not_found(provider: str, ticker: str) -> None:
+    if not hasattr(_symbol_not_found, "keys"):
+        _symbol_not_found.keys = set()
+    _symbol_not_found.keys.add((provider, ticker.upper()))
+
+
+def take_symbol_not_found(provider: str, ticker: str) -> bool:
+    keys = getattr(_symbol_not_found, "keys", None)
+    if not keys or (provider, ticker.upper()) not in keys:
+        return False
+    keys.discard((provider, ticker.upper()))
+    return True
+
+
+# =========================================================
+# RATE LIMITING (token bucket par provider / clé API)
+# =========================================================
+# Quotas en appels/minute (0 = pas de limite), surchargeables via secrets
+PROVIDER_RATE_LIMITS = {
+    "finnhub": int(st.secrets.get("FINNHUB_RATE_PER_MIN", 60)),
+    "twelve data": int(st.secrets.get("TWELVE_RATE_PER_MIN", 8)),
+    "polygon": int(st.secrets.get("POLYGON_RATE_PER_MIN", 0)),
+}
+PROVIDER_API_KEYS = {
+    "finnhub": FINNHUB_API_KEY,
+    "twelve data": TWELVE_API_KEY,
+    "polygon": POLYGON_API_KEY,
+}
+# Attente max pour obtenir un jeton (mode file d'attente) ; 0 = fail-fast
+RATE_LIMIT_WAIT_MS = 8000
+
+
+class TokenBucket:
+    """Seau à jetons thread-safe : `rate_per_min` jetons/minute, rafale max `capacity`."""
+
+    def __init__(self, rate_per_min: float, capacity: Optional[float] = None):
+        self.rate = float(rate_per_min) / 60.0
+        self.capacity = float(capacity or rate_per_min)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, cost: float = 1.0) -> float:
+        """Prend `cost` jetons si possible ; sinon renvoie le délai (s) avant qu'ils soient dispo."""
+        cost = min(float(cost), self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= cost:
+                self._tokens -= cost
+                return 0.0
+            return (cost - self._tokens) / self.rate
+
+    def available(self) -> float:
+        """Jetons disponibles à l'instant (sans en consommer)."""
+        with self._lock:
+            return min(self.capacity, self._tokens + (time.monotonic() - self._last) * self.rate)
+
+    def acquire(self, wait_ms: int = 0, cost: float = 1.0) -> bool:
+        deadline = time.monotonic() + max(0, wait_ms) / 1000.0
+        while True:
+            delay = self.try_acquire(cost)
+            if delay <= 0:
+                return True
+            if time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+
+
+class RateLimiterRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+
+    def bucket(self, provider: str, api_key: str = "") -> Optional[TokenBucket]:
+        rate = PROVIDER_RATE_LIMITS.get(provider, 0)
+        if not rate or rate <= 0:
+            return None
+        key = (provider, hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12])
+        with self._lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(rate)
+            return self._buckets[key]
+
+    def acquire(self, provider: str, api_key: str = "", wait_ms: int = 0, cost: float = 1.0) -> bool:
+        b = self.bucket(provider, api_key)
+        return True if b is None else b.acquire(wait_ms, cost)
+
+
+@st.cache_resource
+def get_rate_limiters() -> RateLimiterRegistry:
+    return RateLimiterRegistry()
+
+
+# =========================================================
+# HTTP SESSION (keep-alive + retries)
+# =========================================================
+HTTP_POOL_HOSTS = [
+    "https://finnhub.io",
+    "https://api.twelvedata.com",
+    "https://api.polygon.io",
+]
+HTTP_POOL_SIZE = 16
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    # Retries bornés avec backoff sur erreurs de connexion et 5xx uniquement :
+    # les 429 et timeouts de lecture sont gérés par le disjoncteur.
+    retry_kwargs = dict(
+        total=3,
+        connect=2,
+        read=0,
+        status=2,
+        backoff_factor=0.4,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        raise_on_status=False,
+    )
+    try:
+        retry = Retry(backoff_jitter=0.3, **retry_kwargs)
+    except TypeError:
+        # urllib3 < 2 : pas de jitter natif
+        retry = Retry(**retry_kwargs)
+    session = requests.Session()
+    # Un pool dimensionné par host provider (le pool urllib3 est thread-safe)
+    for host in HTTP_POOL_HOSTS:
+        session.mount(host, HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry))
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry))
+    return session
+
+
+def provider_configured(provider: str) -> bool:
+    """Clé API renseignée (ou provider sans clé, ex. yfinance)."""
+    return bool(PROVIDER_API_KEYS.get(provider, True))
+
+
+def provider_rate_limited(provider: str) -> bool:
+    """Disjoncteur ouvert ou quota épuisé : une réponse vide ne dit rien du ticker."""
+    if get_circuit_breaker().is_open(provider):
+        return True
+    bucket = get_rate_limiters().bucket(provider, PROVIDER_API_KEYS.get(provider, ""))
+    return bucket is not None and bucket.available() < 1.0
+
+
+def provider_admit(provider: str, wait_ms: int = RATE_LIMIT_WAIT_MS, cost: float = 1.0) -> bool:
+    """Disjoncteur fermé + jeton(s) de quota obtenu(s) : la requête peut partir."""
+    breaker = get_circuit_breaker()
+    if breaker.is_open(provider):
+        return False
+    if not get_rate_limiters().acquire(provider, PROVIDER_API_KEYS.get(provider, ""), wait_ms=wait_ms, cost=cost):
+        return False
+    return breaker.allow(provider)
+
+
+def provider_get(
+    provider: str,
+    url: str,
+    params: Optional[Dict] = None,
+    timeout: float = 15,
+    wait_ms: int = RATE_LIMIT_WAIT_MS,
+    cost: float = 1.0,
+) -> Optional[requests.Response]:
+    """
+    GET vers un provider externe ; None si le disjoncteur est ouvert, si aucun
+    jeton de quota n'est obtenu dans `wait_ms` (0 = fail-fast) ou en cas d'échec réseau.
+    `cost` : crédits consommés par l'appel (ex. Twelve Data multi-symboles).
+    """
+    breaker = get_circuit_breaker()
+    if not provider_admit(provider, wait_ms, cost):
+        return None
+    try:
+        r = get_http_session().get(url, params=params, timeout=timeout)
+    except (requests.Timeout, requests.ConnectionError):
+        breaker.record_failure(provider)
+        return None
+    except Exception:
+        breaker.release(provider)
+        return None
+    if r.status_code == 429:
+        breaker.record_failure(provider)
+    else:
+        breaker.record_success(provider)
+    return r
+
+
+# =========================================================
+# ASYNC PROVIDER ENGINE (I/O concurrente + façade synchrone)
+# =========================================================
+# Optionnel : client HTTP asynchrone natif (sinon, provider_get dans des threads)
+try:
+    import aiohttp
+    HAVE_AIOHTTP = True
+except Exception:
+    HAVE_AIOHTTP = False
+
+# Requêtes simultanées max par host provider
+ASYNC_PER_HOST_LIMIT = 8
+# Reprises bornées sur erreur de connexion / 5xx (comme get_http_session)
+ASYNC_RETRIES = 2
+ASYNC_BACKOFF_S = 0.4
+
+# (provider, url, params)
+ProviderRequest = Tuple[str, str, Optional[Dict]]
+
+
+async def _async_provider_json(
+    session,
+    sem: asyncio.Semaphore,
+    req: ProviderRequest,
+    timeout: float,
+    wait_ms: int,
+):
+    provider, url, params = req
+    async with sem:
+        if session is None:
+            r = await asyncio.to_thread(provider_get, provider, url, params, timeout, wait_ms)
+            if r is None or r.status_code != 200:
+                return None
+            try:
+                return r.json() if r.content else None
+            except Exception:
+                return None
+
+        # Quota / disjoncteur : acquire() peut dormir, on le sort de la boucle
+        if not await asyncio.to_thread(provider_admit, provider, wait_ms):
+            return None
+        breaker = get_circuit_breaker()
+        for attempt in range(ASYNC_RETRIES + 1):
+            last = attempt == ASYNC_RETRIES
+            try:
+                async with session.get(url, params=params, timeout=aiohttp.ClientTimeout(total=timeout)) as r:
+                    if r.status == 429:
+                        breaker.record_failure(provider)
+                        return None
+                    if r.status >= 500 and not last:
+                        await asyncio.sleep(ASYNC_BACKOFF_S * 2 ** attempt)
+                        continue
+                    breaker.record_success(provider)
+                    if r.status != 200:
+                        return None
+                    return await r.json(content_type=None)
+            except aiohttp.ClientConnectionError:
+                # connexion keep-alive fermée côté serveur, reset... : on réessaie
+                if not last:
+                    await asyncio.sleep(ASYNC_BACKOFF_S * 2 ** attempt)
+                    continue
+                breaker.record_failure(provider)
+                return None
+            except asyncio.TimeoutError:
+                breaker.record_failure(provider)
+                return None
+            except Exception:
+                breaker.release(provider)
+                return None
+        return None
+
+
+class AsyncProviderLoop:
+    """
+    Boucle asyncio de fond (un thread par process) et ClientSession aiohttp
+    longue durée : les connexions keep-alive sont réutilisées d'un appel à l'autre.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._session = None
+        self._thread = threading.Thread(target=self.loop.run_forever, name="async-providers", daemon=True)
+        self._thread.start()
+
+    async def session(self):
+        # créée (et recréée si fermée) dans la boucle elle-même : pas de course
+        if HAVE_AIOHTTP and (self._session is None or self._session.closed):
+            connector = aiohttp.TCPConnector(limit_per_host=ASYNC_PER_HOST_LIMIT)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+
+@st.cache_resource
+def get_async_provider_loop() -> AsyncProviderLoop:
+    return AsyncProviderLoop()
+
+
+async def _async_provider_json_many(reqs: List[ProviderRequest], timeout: float, wait_ms: int) -> List:
+    hosts = {urlparse(url).netloc for _, url, _ in reqs}
+    sems = {h: asyncio.Semaphore(ASYNC_PER_HOST_LIMIT) for h in hosts}
+
+    def _sem(url: str) -> asyncio.Semaphore:
+        return sems[urlparse(url).netloc]
+
+    # Sans aiohttp (session None) : provider_get et sa requests.Session poolée, dans des threads
+    session = await get_async_provider_loop().session()
+    return await asyncio.gather(*[
+        _async_provider_json(session, _sem(req[1]), req, timeout, wait_ms) for req in reqs
+    ])
+
+
+def fetch_json_many(
+    reqs: List[ProviderRequest],
+    timeout: float = 15,
+    wait_ms: int = RATE_LIMIT_WAIT_MS,
+) -> List:
+    """
+    Lance toutes les requêtes en parallèle et renvoie les JSON dans le même ordre
+    (None pour une requête en échec, refusée par le quota ou le disjoncteur).
+    """
+    if not reqs:
+        return []
+    # Toujours sur la boucle de fond : fonctionne aussi depuis un thread qui a déjà sa boucle
+    return get_async_provider_loop().run(_async_provider_json_many(list(reqs), timeout, wait_ms))
 
 
 # =========================================================
@@ -2630,6 +3126,52 @@ def fetch_yfinance_single(ticker: str, period: str, auto_adjust: bool) -> pd.Ser
         return pd.Series(dtype=float)
 
 
+def fetch_yfinance_bulk(tickers: List[str], period: str, auto_adjust: bool) -> Dict[str, pd.Series]:
+    out: Dict[str, pd.Series] = {}
+    tickers = [t.upper() for t in tickers if str(t).strip()]
+    if not tickers:
+        return out
+    try:
+        # Un seul appel Yahoo pour tout le panier -> panel "Close" multi-colonnes
+        data = yf.download(tickers, period=period, auto_adjust=auto_adjust, progress=False)
+        if data is None or data.empty:
+            return out
+        close = data["Close"] if "Close" in data else data
+        if isinstance(close, pd.Series):
+            close = close.to_frame(name=tickers[0])
+        close = normalize_cols(close)
+        for t in tickers:
+            if t not in close.columns:
+                continue
+            s = pd.to_numeric(close[t], errors="coerce").dropna()
+            if not s.empty:
+                s.name = t
+                out[t] = s
+    except Exception:
+        return out
+    return out
+
+
+# Barres journalières à demander à Twelve Data selon la période (avec marge
+# pour week-ends / jours fériés) au lieu de 5000 systématiquement
+TWELVE_OUTPUTSIZE = {"1d": 5, "5d": 10, "1mo": 30, "3mo": 70, "1y": 260, "3y": 780, "5y": 1300}
+# Symboles par requête multi-symboles (chaque symbole coûte 1 crédit)
+TWELVE_BATCH_SIZE = 8
+
+
+def _twelve_values_to_series(values, ticker: str, period: str) -> pd.Series:
+    if not values:
+        return pd.Series(dtype=float)
+    df = pd.DataFrame(values)
+    if "datetime" not in df.columns or "close" not in df.columns:
+        return pd.Series(dtype=float)
+    df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
+    df = df.dropna(subset=["datetime"]).sort_values("datetime").set_index("datetime")
+    s = pd.to_numeric(df["close"], errors="coerce").dropna()
+    s.name = ticker.upper()
+    return filter_period_series(s, period)
+
+
 def fetch_twelve_single(ticker: str, period: str) -> pd.Series:
     if not TWELVE_API_KEY:
         return pd.Series(dtype=float)
@@ -2638,31 +3180,61 @@ def fetch_twelve_single(ticker: str, period: str) -> pd.Series:
         params = {
             "symbol": ticker,
             "interval": "1day",
-            "outputsize": 5000,
+            "outputsize": TWELVE_OUTPUTSIZE.get(period, 5000),
             "apikey": TWELVE_API_KEY,
             "format": "JSON",
         }
-        r = requests.get(url, params=params, timeout=20)
-        if r.status_code == 429:
+        r = provider_get("twelve data", url, params=params, timeout=20)
+        if r is None or r.status_code == 429:
             return pd.Series(dtype=float)
         data = r.json() if r.content else {}
         if isinstance(data, dict) and data.get("status") == "error":
+            if data.get("code") in (400, 404):
+                note_symbol_not_found("twelve data", ticker)
             return pd.Series(dtype=float)
         values = data.get("values", []) if isinstance(data, dict) else []
-        if not values:
-            return pd.Series(dtype=float)
-        df = pd.DataFrame(values)
-        if "datetime" not in df.columns or "close" not in df.columns:
-            return pd.Series(dtype=float)
-        df["datetime"] = pd.to_datetime(df["datetime"], errors="coerce")
-        df = df.dropna(subset=["datetime"]).sort_values("datetime").set_index("datetime")
-        s = pd.to_numeric(df["close"], errors="coerce").dropna()
-        s.name = ticker.upper()
-        return filter_period_series(s, period)
+        return _twelve_values_to_series(values, ticker, period)
     except Exception:
         return pd.Series(dtype=float)
 
 
+def fetch_twelve_batch(tickers: List[str], period: str, auto_adjust: bool) -> Dict[str, pd.Series]:
+    _ = auto_adjust
+    out: Dict[str, pd.Series] = {}
+    tickers = [t.upper() for t in tickers if str(t).strip()]
+    if not TWELVE_API_KEY or not tickers:
+        return out
+    url = "https://api.twelvedata.com/time_series"
+    for i in range(0, len(tickers), TWELVE_BATCH_SIZE):
+        chunk = tickers[i:i + TWELVE_BATCH_SIZE]
+        try:
+            params = {
+                "symbol": ",".join(chunk),
+                "interval": "1day",
+                "outputsize": TWELVE_OUTPUTSIZE.get(period, 5000),
+                "apikey": TWELVE_API_KEY,
+                "format": "JSON",
+            }
+            r = provider_get("twelve data", url, params=params, timeout=20, cost=len(chunk))
+            if r is None or r.status_code == 429:
+                continue
+            data = r.json() if r.content else {}
+            if not isinstance(data, dict):
+                continue
+            # Un seul symbole -> réponse "plate" ; plusieurs -> dict par symbole
+            per_symbol = {chunk[0]: data} if len(chunk) == 1 else data
+            for t in chunk:
+                block = per_symbol.get(t)
+                if not isinstance(block, dict) or block.get("status") == "error":
+                    continue
+                s = _twelve_values_to_series(block.get("values", []), t, period)
+                if not s.empty:
+                    out[t] = s
+        except Exception:
+            continue
+    return out
+
+
 def fetch_finnhub_single(ticker: str, period: str) -> pd.Series:
     if not FINNHUB_API_KEY:
         return pd.Series(dtype=float)
@@ -2692,12 +3264,14 @@ def fetch_finnhub_single(ticker: str, period: str) -> pd.Series:
             "to": end_unix,
             "token": FINNHUB_API_KEY,
         }
-        r = requests.get(url, params=params, timeout=20)
+        r = provider_get("finnhub", url, params=params, timeout=20)
 
-        if r.status_code == 429:
+        if r is None or r.status_code == 429:
             return pd.Series(dtype=float)
         data = r.json() if r.content else {}
         if not isinstance(data, dict) or data.get("s") != "ok":
+            if isinstance(data, dict) and data.get("s") == "no_data":
+                note_symbol_not_found("finnhub", ticker)
             return pd.Series(dtype=float)
         closes = data.get("c", [])
         times = data.get("t", [])
@@ -2721,8 +3295,8 @@ def fetch_realtime_polygon_last(ticker: str) -> Optional[Tuple[float, pd.Timesta
     url = f"https://api.polygon.io/v2/last/trade/{t}"
     params = {"apiKey": POLYGON_API_KEY}
     try:
-        r = requests.get(url, params=params, timeout=15)
-        if r.status_code == 429:
+        r = provider_get("polygon", url, params=params, timeout=15)
+        if r is None or r.status_code == 429:
             return None
         data = r.json() if r.content else {}
         last = data.get("last", {})
@@ -2736,7 +3310,49 @@ def fetch_realtime_polygon_last(ticker: str) -> Optional[Tuple[float, pd.Timesta
         return None
 
 
-def fetch_realtime_polygon_batch(tickers: List[str]) -> Dict[str, Tuple[float, pd.Timestamp]]:
+def fetch_realtime_polygon_snapshot(tickers: List[str]) -> Optional[Dict[str, Tuple[float, pd.Timestamp]]]:
+    """Dernier trade de tout le panier en un appel ; None si l'endpoint snapshot est indisponible."""
+    if not POLYGON_API_KEY or not tickers:
+        return None
+    url = "https://api.polygon.io/v2/snapshot/locale/us/markets/stocks/tickers"
+    params = {"tickers": ",".join(t.upper() for t in tickers), "apiKey": POLYGON_API_KEY}
+    try:
+        r = provider_get("polygon", url, params=params, timeout=15)
+        if r is None or r.status_code != 200:
+            return None
+        data = r.json() if r.content else {}
+        out: Dict[str, Tuple[float, pd.Timestamp]] = {}
+        for item in data.get("tickers", []) or []:
+            t = str(item.get("ticker", "")).upper()
+            last = item.get("lastTrade") or {}
+            price = last.get("p")
+            ts = last.get("t")
+            if not t or price is None:
+                continue
+            # horodatage snapshot en nanosecondes
+            dt = pd.to_datetime(int(ts), unit="ns", utc=True).tz_convert(None) if ts else pd.Timestamp.utcnow().tz_localize(None)
+            out[t] = (float(price), dt)
+        return out
+    except Exception:
+        return None
+
+
+# =========================================================
+# REALTIME BUS (un poller par process, partagé par toutes les sessions)
+# =========================================================
+QuoteFeed = Callable[[List[str]], Dict[str, Tuple[float, pd.Timestamp]]]
+
+REALTIME_BUS_INTERVAL_S = 5
+# Abonnement non renouvelé (session fermée / onglet quitté) -> expiré
+REALTIME_LEASE_S = 90
+# "polygon" (défaut) ou "local" (flux simulé pour les tests, sans réseau)
+REALTIME_FEED = st.secrets.get("REALTIME_FEED", "polygon")
+
+
+def polygon_quote_feed(tickers: List[str]) -> Dict[str, Tuple[float, pd.Timestamp]]:
+    snap = fetch_realtime_polygon_snapshot(tickers)
+    if snap is not None:
+        return snap
     out: Dict[str, Tuple[float, pd.Timestamp]] = {}
     for t in tickers:
         res = fetch_realtime_polygon_last(t)
@@ -2745,101 +3361,1156 @@ def fetch_realtime_polygon_batch(tickers: List[str]) -> Dict[str, Tuple[float, p
     return out
 
 
+class LocalQuoteFeed:
+    """Flux de cotations simulé (marche aléatoire), substituable au flux Polygon."""
+
+    def __init__(self, base_prices: Optional[Dict[str, float]] = None, vol: float = 0.001, seed: Optional[int] = None):
+        self._last = {k.upper(): float(v) for k, v in (base_prices or {}).items()}
+        self._vol = vol
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, tickers: List[str]) -> Dict[str, Tuple[float, pd.Timestamp]]:
+        now = pd.Timestamp.utcnow().tz_localize(None)
+        out: Dict[str, Tuple[float, pd.Timestamp]] = {}
+        with self._lock:
+            for t in tickers:
+                t = t.upper()
+                p = self._last.get(t, 100.0) * float(np.exp(self._rng.normal(0.0, self._vol)))
+                self._last[t] = p
+                out[t] = (p, now)
+        return out
+
+
+class RealtimePriceBus:
+    """
+    Dernière cotation par ticker abonné, alimentée par un thread de fond unique.
+    Les sessions s'abonnent (bail renouvelé à chaque rerun) et lisent sans I/O ;
+    un ticker qui n'est plus regardé par aucune session n'est plus interrogé.
+    """
+
+    def __init__(self, feed: QuoteFeed, interval_s: float = REALTIME_BUS_INTERVAL_S, lease_s: float = REALTIME_LEASE_S):
+        self.feed = feed
+        self.interval_s = interval_s
+        self.lease_s = lease_s
+        self._lock = threading.Lock()
+        self._quotes: Dict[str, Tuple[float, pd.Timestamp]] = {}
+        self._subs: Dict[str, Tuple[frozenset, float]] = {}
+        self._wake = threading.Event()
+        # génération de poll (incrémentée à chaque tick) et poll en cours
+        self._ticks = threading.Condition()
+        self._generation = 0
+        self._polling = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, session_id: str, tickers: List[str]) -> None:
+        wanted = frozenset(t.upper() for t in tickers if str(t).strip())
+        with self._lock:
+            self._subs[session_id] = (wanted, time.monotonic())
+            missing = [t for t in wanted if t not in self._quotes]
+        self._ensure_started()
+        if missing:
+            # premier abonnement : le poller est réveillé plutôt que d'attendre son tick
+            self._wake.set()
+
+    def unsubscribe(self, session_id: str) -> None:
+        with self._lock:
+            self._subs.pop(session_id, None)
+
+    def refcounts(self) -> Dict[str, int]:
+        now = time.monotonic()
+        counts: Dict[str, int] = {}
+        with self._lock:
+            for sid in [sid for sid, (_, seen) in self._subs.items() if now - seen > self.lease_s]:
+                del self._subs[sid]
+            for wanted, _ in self._subs.values():
+                for t in wanted:
+                    counts[t] = counts.get(t, 0) + 1
+            # on oublie les cotations que plus personne ne regarde
+            for t in [t for t in self._quotes if t not in counts]:
+                del self._quotes[t]
+        return counts
+
+    def latest(self, tickers: List[str]) -> Dict[str, Tuple[float, pd.Timestamp]]:
+        with self._lock:
+            return {t.upper(): self._quotes[t.upper()] for t in tickers if t.upper() in self._quotes}
+
+    def poll_once(self, tickers: Optional[List[str]] = None) -> None:
+        if tickers is None:
+            tickers = sorted(self.refcounts())
+        if not tickers:
+            return
+        try:
+            fresh = self.feed(list(tickers)) or {}
+        except Exception:
+            fresh = {}
+        with self._lock:
+            self._quotes.update({t.upper(): q for t, q in fresh.items()})
+
+    def refresh(self, timeout: float = REALTIME_BUS_INTERVAL_S) -> None:
+        """Réveille le poller et attend un tick démarré après l'appel (borné) ; aucun I/O côté session."""
+        self._ensure_started()
+        with self._ticks:
+            # un poll déjà en vol peut finir avec des cotations d'avant le clic
+            target = self._generation + (2 if self._polling else 1)
+            self._wake.set()
+            self._ticks.wait_for(lambda: self._generation >= target, timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._ticks:
+                self._wake.clear()
+                self._polling = True
+            try:
+                self.poll_once()
+            finally:
+                with self._ticks:
+                    self._polling = False
+                    self._generation += 1
+                    self._ticks.notify_all()
+            self._wake.wait(self.interval_s)
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="realtime-bus", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+
+@st.cache_resource
+def get_realtime_bus() -> RealtimePriceBus:
+    feed: QuoteFeed = LocalQuoteFeed() if REALTIME_FEED == "local" else polygon_quote_feed
+    return RealtimePriceBus(feed)
+
+
 # =========================================================
 # NEWS FINNHUB
 # =========================================================
-@st.cache_data(ttl=900)
-def load_news_finnhub(ticker: str, days: int = 7, max_items: int = 10) -> pd.DataFrame:
-    if not FINNHUB_API_KEY:
-        return pd.DataFrame()
-    try:
-        end = pd.Timestamp.utcnow().normalize()
-        start = end - pd.Timedelta(days=days)
-        url = "https://finnhub.io/api/v1/company-news"
-        params = {
-            "symbol": ticker.upper(),
+# Un ticker n'est pas réinterrogé plus souvent que ça
+NEWS_REFRESH_S = 900
+# Articles plus vieux que ça : oubliés
+NEWS_RETENTION_DAYS = 30
+NEWS_COLUMNS = ["datetime", "source", "headline", "summary", "url"]
+
+
+class NewsStore:
+    """
+    Articles Finnhub partagés par tout le process, indexés par id Finnhub.
+    Par ticker : plus haut horodatage vu (high-water mark) et début de fenêtre
+    couverte, pour ne redemander que les articles plus récents.
+    Un article publié sous plusieurs tickers n'est stocké qu'une fois.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._articles: Dict = {}
+        self._state: Dict[str, Dict] = {}
+
+    def _request_for(self, ticker: str, window_start: pd.Timestamp, today: pd.Timestamp) -> Optional[ProviderRequest]:
+        st_ = self._state.get(ticker, {})
+        if st_.get("covered_from") is not None and st_["covered_from"] <= window_start:
+            if time.monotonic() - st_.get("fetched_at", 0.0) < NEWS_REFRESH_S:
+                return None
+            hwm = st_.get("hwm")
+            start = hwm.normalize() if hwm is not None else window_start
+        else:
+            start = window_start
+        return ("finnhub", "https://finnhub.io/api/v1/company-news", {
+            "symbol": ticker,
             "from": start.date().isoformat(),
-            "to": end.date().isoformat(),
+            "to": today.date().isoformat(),
             "token": FINNHUB_API_KEY,
-        }
-        r = requests.get(url, params=params, timeout=15)
-        if r.status_code == 429:
-            return pd.DataFrame()
-        data = r.json() if r.content else []
-        if not isinstance(data, list) or not data:
+        })
+
+    def refresh(self, tickers: List[str], days: int) -> None:
+        if not FINNHUB_API_KEY:
+            return
+        today = pd.Timestamp.utcnow().tz_localize(None).normalize()
+        window_start = today - pd.Timedelta(days=days)
+        with self._lock:
+            due = []
+            for t in sorted({t.upper() for t in tickers if str(t).strip()}):
+                req = self._request_for(t, window_start, today)
+                if req is not None:
+                    due.append((t, req))
+        if not due:
+            return
+        # Tous les abonnements en une vague concurrente
+        payloads = fetch_json_many([req for _, req in due], timeout=15)
+        with self._lock:
+            for (t, _), data in zip(due, payloads):
+                if not isinstance(data, list):
+                    continue
+                st_ = self._state.setdefault(t, {"hwm": None, "covered_from": None})
+                for item in data:
+                    if not isinstance(item, dict) or "datetime" not in item:
+                        continue
+                    try:
+                        dt = pd.to_datetime(int(item["datetime"]), unit="s", utc=True).tz_convert(None)
+                    except Exception:
+                        continue
+                    key = item.get("id") or item.get("url") or item.get("headline")
+                    if key is None:
+                        continue
+                    art = self._articles.get(key)
+                    if art is None:
+                        art = {c: item.get(c, "") for c in NEWS_COLUMNS}
+                        art["datetime"] = dt
+                        art["tickers"] = set()
+                        self._articles[key] = art
+                    art["tickers"].add(t)
+                    if st_["hwm"] is None or dt > st_["hwm"]:
+                        st_["hwm"] = dt
+                if st_["covered_from"] is None or window_start < st_["covered_from"]:
+                    st_["covered_from"] = window_start
+                st_["fetched_at"] = time.monotonic()
+            cutoff = today - pd.Timedelta(days=NEWS_RETENTION_DAYS)
+            for key in [k for k, a in self._articles.items() if a["datetime"] < cutoff]:
+                del self._articles[key]
+
+    def articles_for(self, tickers: List[str], days: int, max_per_ticker: int = 0) -> pd.DataFrame:
+        wanted = {t.upper() for t in tickers}
+        start = pd.Timestamp.utcnow().tz_localize(None).normalize() - pd.Timedelta(days=days)
+        with self._lock:
+            arts = [a for a in self._articles.values() if a["datetime"] >= start and a["tickers"] & wanted]
+            arts = [dict(a, tickers=sorted(a["tickers"] & wanted)) for a in arts]
+        arts.sort(key=lambda a: a["datetime"], reverse=True)
+        if max_per_ticker:
+            kept, per = [], {}
+            for a in arts:
+                if any(per.get(t, 0) < max_per_ticker for t in a["tickers"]):
+                    kept.append(a)
+                    for t in a["tickers"]:
+                        per[t] = per.get(t, 0) + 1
+            arts = kept
+        if not arts:
             return pd.DataFrame()
-        df = pd.DataFrame(data)
-        if "datetime" in df.columns:
-            df["datetime"] = pd.to_datetime(df["datetime"], unit="s", utc=True).dt.tz_convert(None)
-        df = df.sort_values("datetime", ascending=False)
-        if max_items:
-            df = df.head(max_items)
-        cols = []
-        for c in ["datetime", "source", "headline", "summary", "url"]:
-            if c in df.columns:
-                cols.append(c)
-        return df[cols]
-    except Exception:
+        df = pd.DataFrame(arts)
+        df["Ticker"] = df["tickers"].apply(", ".join)
+        return df[NEWS_COLUMNS + ["Ticker"]].reset_index(drop=True)
+
+
+@st.cache_resource
+def get_news_store() -> NewsStore:
+    return NewsStore()
+
+
+def load_news_many(tickers: List[str], days: int = 5, max_per_ticker: int = 5) -> pd.DataFrame:
+    store = get_news_store()
+    store.refresh(tickers, days)
+    return store.articles_for(tickers, days, max_per_ticker)
+
+
+def load_news_finnhub(ticker: str, days: int = 7, max_items: int = 10) -> pd.DataFrame:
+    if not FINNHUB_API_KEY:
         return pd.DataFrame()
+    df = load_news_many([ticker], days=days, max_per_ticker=0)
+    if df.empty:
+        return df
+    if max_items:
+        df = df.head(max_items)
+    return df[NEWS_COLUMNS]
 
 
 # =========================================================
-# FALLBACK PER TICKER
+# PRICE STORE (disque, delta incrémental)
 # =========================================================
-ProviderFn = Callable[[str, str, bool], pd.Series]
-
+PRICE_STORE_DIR = "price_store"
+# En dessous de cet âge, l'historique stocké est servi sans appel provider
+PRICE_STORE_MIN_AGE = pd.Timedelta(minutes=30)
+# Écart relatif toléré sur les barres communes stock / queue avant rechargement complet
+PRICE_STORE_REBASE_TOL = 5e-4
 
-def provider_twelve(ticker: str, period: str, auto_adjust: bool) -> pd.Series:
-    _ = auto_adjust
-    return fetch_twelve_single(ticker, period)
+PERIOD_ORDER = ["1d", "5d", "1mo", "3mo", "1y", "3y", "5y"]
+# Couverture (en jours) de chaque période, pour choisir la plus petite
+# requête qui couvre la queue manquante
+PERIOD_SPAN_DAYS = {"5d": 5, "1mo": 30, "3mo": 90, "1y": 365, "3y": 3 * 365, "5y": 5 * 365}
 
 
-def provider_finnhub(ticker: str, period: str, auto_adjust: bool) -> pd.Series:
-    _ = auto_adjust
-    return fetch_finnhub_single(ticker, period)
+def period_rank(period: str) -> int:
+    try:
+        return PERIOD_ORDER.index(period)
+    except ValueError:
+        return len(PERIOD_ORDER)
+
+
+def period_covering(days: int) -> str:
+    for p, span in PERIOD_SPAN_DAYS.items():
+        # marge pour week-ends / jours fériés
+        if span >= days + 3:
+            return p
+    return "5y"
+
+
+def _daily_index(s: pd.Series) -> pd.Series:
+    # Barres journalières : index naïf, ramené à minuit (clé commune disque / Postgres)
+    if isinstance(s.index, pd.DatetimeIndex):
+        s = s.copy()
+        if s.index.tz is not None:
+            s.index = s.index.tz_convert(None)
+        s.index = s.index.normalize()
+    return s
 
 
-def provider_yahoo(ticker: str, period: str, auto_adjust: bool) -> pd.Series:
-    return fetch_yfinance_single(ticker, period, auto_adjust)
+def merge_price_series(old: pd.Series, new: pd.Series) -> pd.Series:
+    if old is None or old.empty:
+        return _daily_index(new).sort_index()
+    if new is None or new.empty:
+        return _daily_index(old).sort_index()
+    merged = pd.concat([_daily_index(old), _daily_index(new)])
+    # En cas de doublon de date, la barre fraîchement téléchargée gagne
+    merged = merged[~merged.index.duplicated(keep="last")].sort_index()
+    merged.name = new.name
+    return merged
+
+
+def price_store_rebased(stored: pd.Series, new: pd.Series) -> bool:
+    """
+    La queue téléchargée recouvre les dernières barres stockées : si leurs
+    clôtures divergent (split, dividende en cours ajusté), tout l'historique
+    stocké est sur l'ancienne base et doit être rechargé, pas raccordé.
+    """
+    if stored is None or stored.empty or new is None or new.empty:
+        return False
+    old = _daily_index(stored).dropna().sort_index()
+    fresh = _daily_index(new).dropna()
+    old = old[~old.index.duplicated(keep="last")]
+    fresh = fresh[~fresh.index.duplicated(keep="last")]
+    # la dernière barre stockée a pu être prise en séance : hors comparaison
+    common = old.index[:-1].intersection(fresh.index)
+    if common.empty:
+        return False
+    a = old.loc[common].to_numpy(dtype=float)
+    b = fresh.loc[common].to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel = np.abs(b / a - 1.0)
+    return bool(np.nanmax(rel) > PRICE_STORE_REBASE_TOL) if np.isfinite(rel).any() else False
+
+
+def price_store_full_period(meta: Dict, period: str) -> str:
+    return max([meta.get("period", "") or period, period], key=period_rank)
+
+
+def _price_store_paths(provider: str, ticker: str, auto_adjust: bool) -> Tuple[str, str]:
+    safe = "".join(ch if ch.isalnum() else "_" for ch in f"{provider}__{ticker.upper()}")
+    base = os.path.join(PRICE_STORE_DIR, f"{safe}__{'adj' if auto_adjust else 'raw'}")
+    ext = ".parquet" if HAVE_PARQUET else ".pkl"
+    return base + ext, base + ".json"
+
+
+def price_store_read(provider: str, ticker: str, auto_adjust: bool) -> Tuple[pd.Series, Dict]:
+    data_path, meta_path = _price_store_paths(provider, ticker, auto_adjust)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return pd.Series(dtype=float), {}
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if HAVE_PARQUET:
+            s = pd.read_parquet(data_path)["close"]
+        else:
+            s = pd.read_pickle(data_path)
+        s = pd.to_numeric(s, errors="coerce").dropna().sort_index()
+        s.name = ticker.upper()
+        return s, meta if isinstance(meta, dict) else {}
+    except Exception:
+        return pd.Series(dtype=float), {}
+
+
+def price_store_write(provider: str, ticker: str, auto_adjust: bool, s: pd.Series, meta: Dict) -> None:
+    data_path, meta_path = _price_store_paths(provider, ticker, auto_adjust)
+    try:
+        os.makedirs(PRICE_STORE_DIR, exist_ok=True)
+        # écriture atomique : fichier temporaire puis os.replace
+        tmp_data = f"{data_path}.{secrets.token_hex(4)}.tmp"
+        if HAVE_PARQUET:
+            s.rename("close").to_frame().to_parquet(tmp_data)
+        else:
+            pd.to_pickle(s, tmp_data)
+        os.replace(tmp_data, data_path)
+        tmp_meta = f"{meta_path}.{secrets.token_hex(4)}.tmp"
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_path)
+    except Exception:
+        pass
+
+
+# ---------------------------------------------------------
+# Cache partagé Postgres (price_bars), commun à tous les réplicas
+# ---------------------------------------------------------
+@st.cache_resource
+def ensure_price_bars_table() -> bool:
+    if engine is None:
+        return False
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                create table if not exists price_bars (
+                    provider text not null,
+                    ticker text not null,
+                    adjusted boolean not null,
+                    bar_date date not null,
+                    close double precision not null,
+                    primary key (provider, ticker, adjusted, bar_date)
+                )
+            """))
+            conn.execute(text("""
+                create table if not exists price_bars_meta (
+                    provider text not null,
+                    ticker text not null,
+                    adjusted boolean not null,
+                    period text not null,
+                    last_date date,
+                    updated_at timestamptz not null default now(),
+                    primary key (provider, ticker, adjusted)
+                )
+            """))
+        return True
+    except Exception:
+        return False
+
+
+def price_bars_read(provider: str, tickers: List[str], auto_adjust: bool) -> Dict[str, Tuple[pd.Series, Dict]]:
+    out: Dict[str, Tuple[pd.Series, Dict]] = {}
+    if not tickers or not ensure_price_bars_table():
+        return out
+    tks = [t.upper() for t in tickers]
+    try:
+        with engine.connect() as conn:
+            metas = conn.execute(text("""
+                select ticker, period, updated_at from price_bars_meta
+                where provider = :p and adjusted = :a and ticker = any(:tks)
+            """), {"p": provider, "a": bool(auto_adjust), "tks": tks}).fetchall()
+            if not metas:
+                return out
+            bars = conn.execute(text("""
+                select ticker, bar_date, close from price_bars
+                where provider = :p and adjusted = :a and ticker = any(:tks)
+                order by ticker, bar_date
+            """), {"p": provider, "a": bool(auto_adjust), "tks": [m[0] for m in metas]}).fetchall()
+    except Exception:
+        return out
+    if not bars:
+        return out
+    df = pd.DataFrame(bars, columns=["ticker", "bar_date", "close"])
+    df["bar_date"] = pd.to_datetime(df["bar_date"])
+    for tk, period, updated_at in metas:
+        g = df[df["ticker"] == tk]
+        if g.empty:
+            continue
+        s = pd.Series(g["close"].astype(float).values, index=pd.DatetimeIndex(g["bar_date"]), name=tk)
+        ts = pd.Timestamp(updated_at)
+        if ts.tzinfo is not None:
+            ts = ts.tz_convert(None)
+        out[tk] = (s, {
+            "period": period,
+            "last_date": s.index.max().isoformat(),
+            "updated_at": ts.isoformat(),
+            "shared": True,
+        })
+    return out
+
+
+def price_bars_upsert(
+    provider: str,
+    ticker: str,
+    auto_adjust: bool,
+    bars: pd.Series,
+    meta: Dict,
+    replace: bool = False,
+) -> bool:
+    if bars is None or bars.empty or not ensure_price_bars_table():
+        return False
+    rows = [
+        {"p": provider, "tk": ticker.upper(), "a": bool(auto_adjust), "d": d.date(), "c": float(c)}
+        for d, c in bars.dropna().items()
+    ]
+    try:
+        with engine.begin() as conn:
+            if replace:
+                conn.execute(text("""
+                    delete from price_bars where provider = :p and ticker = :tk and adjusted = :a
+                """), {"p": provider, "tk": ticker.upper(), "a": bool(auto_adjust)})
+            conn.execute(text("""
+                insert into price_bars (provider, ticker, adjusted, bar_date, close)
+                values (:p, :tk, :a, :d, :c)
+                on conflict (provider, ticker, adjusted, bar_date) do update
+                set close = excluded.close
+            """), rows)
+            conn.execute(text("""
+                insert into price_bars_meta (provider, ticker, adjusted, period, last_date, updated_at)
+                values (:p, :tk, :a, :period, :last_date, now())
+                on conflict (provider, ticker, adjusted) do update
+                set period = excluded.period,
+                    last_date = excluded.last_date,
+                    updated_at = now()
+            """), {
+                "p": provider, "tk": ticker.upper(), "a": bool(auto_adjust),
+                "period": meta.get("period", ""),
+                "last_date": pd.Timestamp(meta.get("last_date")).date() if meta.get("last_date") else None,
+            })
+        return True
+    except Exception:
+        return False
+
+
+def _meta_ts(meta: Dict) -> pd.Timestamp:
+    try:
+        ts = pd.Timestamp(meta.get("updated_at"))
+        return pd.Timestamp.min if pd.isna(ts) else ts
+    except Exception:
+        return pd.Timestamp.min
+
+
+def price_store_load(provider: str, tickers: List[str], auto_adjust: bool, period: str) -> Dict[str, Tuple[pd.Series, Dict]]:
+    # Tier 1 : disque local
+    states = {t: price_store_read(provider, t, auto_adjust) for t in tickers}
+    # Tier 2 : Postgres partagé, seulement pour ce que le disque ne sert pas
+    need = [t for t, (s_loc, m_loc) in states.items() if price_store_plan(s_loc, m_loc, period) is not None]
+    if not need:
+        return states
+    shared = price_bars_read(provider, need, auto_adjust)
+    for t in need:
+        if t.upper() not in shared:
+            continue
+        s_db, m_db = shared[t.upper()]
+        s_loc, m_loc = states[t]
+        if s_loc.empty or _meta_ts(m_db) > _meta_ts(m_loc) or period_rank(m_db["period"]) > period_rank(m_loc.get("period", "")):
+            merged = merge_price_series(s_loc, s_db)
+            merged.name = t.upper()
+            meta = {
+                "period": max([m_db["period"], m_loc.get("period", "")], key=period_rank) if m_loc.get("period") else m_db["period"],
+                "last_date": merged.index.max().isoformat(),
+                "updated_at": max(_meta_ts(m_db), _meta_ts(m_loc)).isoformat(),
+                "shared": True,
+            }
+            price_store_write(provider, t, auto_adjust, merged, meta)
+            states[t] = (merged, meta)
+    return states
+
+
+def price_store_plan(stored: pd.Series, meta: Dict, period: str) -> Optional[str]:
+    """
+    Période à demander au provider, ou None si le stock suffit tel quel.
+    - rien de stocké / période plus longue demandée -> historique complet
+    - sinon -> uniquement la queue manquante depuis la dernière date stockée
+    """
+    if stored is None or stored.empty or period_rank(meta.get("period", "")) < period_rank(period):
+        return period
+    now = pd.Timestamp.utcnow().tz_localize(None)
+    try:
+        updated_at = pd.Timestamp(meta.get("updated_at"))
+    except Exception:
+        updated_at = None
+    if updated_at is not None and not pd.isna(updated_at) and now - updated_at < PRICE_STORE_MIN_AGE:
+        return None
+    gap_days = max(0, (now.normalize() - stored.index.max().normalize()).days)
+    return period_covering(gap_days)
+
+
+def price_store_commit(
+    provider: str,
+    ticker: str,
+    auto_adjust: bool,
+    stored: pd.Series,
+    meta: Dict,
+    new: pd.Series,
+    fetch_period: str,
+    period: str,
+    replace: bool = False,
+) -> pd.Series:
+    if new is None or new.empty:
+        # provider muet : on sert l'historique stocké s'il couvre la demande
+        if stored is not None and not stored.empty and fetch_period != period:
+            return filter_period_series(stored, period)
+        return pd.Series(dtype=float)
+    # replace : historique rechargé sur une nouvelle base, l'ancien est écarté
+    merged = merge_price_series(pd.Series(dtype=float) if replace else stored, new)
+    merged.name = ticker.upper()
+    covered = meta.get("period", "") if not stored.empty and not replace else ""
+    new_meta = {
+        "period": max([covered, fetch_period], key=period_rank) if covered else fetch_period,
+        "last_date": merged.index.max().isoformat(),
+        "updated_at": pd.Timestamp.utcnow().tz_localize(None).isoformat(),
+    }
+    # Postgres : seulement le delta si l'entrée y est déjà, sinon tout l'historique
+    bars = _daily_index(new) if meta.get("shared") and not replace else merged
+    new_meta["shared"] = price_bars_upsert(provider, ticker, auto_adjust, bars, new_meta, replace=replace) \
+        or bool(meta.get("shared"))
+    price_store_write(provider, ticker, auto_adjust, merged, new_meta)
+    return filter_period_series(merged, period)
+
+
+def fetch_series_stored(provider: str, fn: "ProviderFn", ticker: str, period: str, auto_adjust: bool) -> pd.Series:
+    stored, meta = price_store_load(provider, [ticker], auto_adjust, period)[ticker]
+    fetch_period = price_store_plan(stored, meta, period)
+    if fetch_period is None:
+        return filter_period_series(stored, period)
+    negative = get_negative_cache()
+    if get_circuit_breaker().is_open(provider) or negative.lookup(ticker, provider):
+        # provider en pause / échec récent : on sert ce qu'on a sans réinterroger
+        return filter_period_series(stored, period)
+    # Sans clé API, la réponse vide ne dit rien du ticker : rien n'est mémorisé
+    configured = provider_configured(provider)
+    take_symbol_not_found(provider, ticker)
+    t0 = time.monotonic()
+    try:
+        new = fn(ticker, fetch_period, auto_adjust)
+    except Exception:
+        if configured:
+            negative.record(ticker, provider, "error")
+        raise
+    elapsed = time.monotonic() - t0
+    not_found = take_symbol_not_found(provider, ticker)
+    if new is not None and not new.empty:
+        get_provider_latency().record(provider, elapsed)
+        negative.clear(ticker, provider)
+    elif stored.empty and configured and not provider_rate_limited(provider):
+        if elapsed >= NEGATIVE_SLOW_S:
+            reason = "timeout"
+        else:
+            # "inconnu" seulement sur refus explicite du provider
+            reason = "unknown" if not_found else "error"
+        negative.record(ticker, provider, reason)
+    if price_store_rebased(stored, new):
+        full_period = price_store_full_period(meta, period)
+        try:
+            full = fn(ticker, full_period, auto_adjust)
+        except Exception:
+            full = None
+        if full is None or full.empty:
+            # pas de raccord sur deux bases : l'ancien historique, cohérent, en attendant
+            return filter_period_series(stored, period)
+        return price_store_commit(provider, ticker, auto_adjust, stored, meta, full, full_period, period, replace=True)
+    return price_store_commit(provider, ticker, auto_adjust, stored, meta, new, fetch_period, period)
+
+
+def fetch_bulk_stored(
+    provider: str,
+    bulk_fn: "BulkProviderFn",
+    tickers: List[str],
+    period: str,
+    auto_adjust: bool,
+) -> Dict[str, pd.Series]:
+    out: Dict[str, pd.Series] = {}
+    states: Dict[str, Tuple[pd.Series, Dict, str]] = {}
+    groups: Dict[str, List[str]] = {}
+    negative = get_negative_cache()
+    paused = get_circuit_breaker().is_open(provider)
+    for t, (stored, meta) in price_store_load(provider, tickers, auto_adjust, period).items():
+        fetch_period = price_store_plan(stored, meta, period)
+        if fetch_period is None:
+            out[t] = filter_period_series(stored, period)
+            continue
+        if paused or negative.lookup(t, provider):
+            if not stored.empty:
+                out[t] = filter_period_series(stored, period)
+            continue
+        states[t] = (stored, meta, fetch_period)
+        groups.setdefault(fetch_period, []).append(t)
+    # Un appel bulk par longueur de queue (en pratique : un seul)
+    for fetch_period, group in groups.items():
+        try:
+            fetched = bulk_fn(group, fetch_period, auto_adjust)
+        except Exception:
+            fetched = {}
+        # le provider a répondu pour d'autres symboles : les absents sont inconnus
+        answered = any(s is not None and not s.empty for s in fetched.values())
+        rebased: Dict[str, List[str]] = {}
+        for t in group:
+            stored, meta, _ = states[t]
+            if answered and stored.empty and (fetched.get(t) is None or fetched[t].empty):
+                negative.record(t, provider, "unknown")
+            if price_store_rebased(stored, fetched.get(t)):
+                rebased.setdefault(price_store_full_period(meta, period), []).append(t)
+                continue
+            s = price_store_commit(
+                provider, t, auto_adjust, stored, meta,
+                fetched.get(t, pd.Series(dtype=float)), fetch_period, period,
+            )
+            if not s.empty:
+                out[t] = s
+        # Historique re-basé (split, dividende) : rechargement complet, pas de raccord
+        for full_period, rb_group in rebased.items():
+            try:
+                full = bulk_fn(rb_group, full_period, auto_adjust)
+            except Exception:
+                full = {}
+            for t in rb_group:
+                stored, meta, _ = states[t]
+                s_full = full.get(t)
+                if s_full is None or s_full.empty:
+                    out[t] = filter_period_series(stored, period)
+                    continue
+                out[t] = price_store_commit(
+                    provider, t, auto_adjust, stored, meta, s_full, full_period, period, replace=True,
+                )
+    return out
+
+
+# =========================================================
+# CACHE POLICY (LRU borné en octets + expiration calendaire)
+# =========================================================
+DATA_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Marché ouvert : la dernière barre bouge encore -> expiration courte
+INTRADAY_TTL = pd.Timedelta(minutes=5)
+# Délai après la clôture avant que la barre EOD soit publiée par les providers
+EOD_PUBLISH_DELAY = pd.Timedelta(minutes=20)
+# Résultat vide (provider en panne, quota...) : on réessaie vite
+EMPTY_RESULT_TTL = pd.Timedelta(minutes=5)
+
+# Place -> (fuseau, ouverture, clôture) ; jours fériés non gérés
+EXCHANGE_SESSIONS = {
+    "US": ("America/New_York", "09:30", "16:00"),
+    "PA": ("Europe/Paris", "09:00", "17:30"),
+    "DE": ("Europe/Berlin", "09:00", "17:30"),
+    "L": ("Europe/London", "08:00", "16:30"),
+}
+TICKER_SUFFIX_EXCHANGE = {".PA": "PA", ".AS": "PA", ".BR": "PA", ".MI": "PA", ".DE": "DE", ".L": "L"}
+INDEX_EXCHANGE = {"^FCHI": "PA", "^STOXX50E": "DE", "^GDAXI": "DE", "^FTSE": "L"}
+
+
+def ticker_exchange(ticker: str) -> str:
+    t = ticker.upper()
+    if t in INDEX_EXCHANGE:
+        return INDEX_EXCHANGE[t]
+    for suffix, exch in TICKER_SUFFIX_EXCHANGE.items():
+        if t.endswith(suffix):
+            return exch
+    return "US"
+
+
+def _session_bounds(exchange: str, day: pd.Timestamp) -> Tuple[pd.Timestamp, pd.Timestamp]:
+    tz, open_s, close_s = EXCHANGE_SESSIONS[exchange]
+    d = day.strftime("%Y-%m-%d")
+    return pd.Timestamp(f"{d} {open_s}", tz=tz), pd.Timestamp(f"{d} {close_s}", tz=tz)
+
+
+def market_is_open(exchange: str, now: Optional[pd.Timestamp] = None) -> bool:
+    tz = EXCHANGE_SESSIONS[exchange][0]
+    local = (now if now is not None else pd.Timestamp.now(tz="UTC")).tz_convert(tz)
+    if local.weekday() >= 5:
+        return False
+    open_ts, close_ts = _session_bounds(exchange, local)
+    return open_ts <= local < close_ts
+
+
+def next_close(exchange: str, now: Optional[pd.Timestamp] = None) -> pd.Timestamp:
+    """Prochaine clôture (UTC) de la place, en sautant les week-ends."""
+    tz = EXCHANGE_SESSIONS[exchange][0]
+    local = (now if now is not None else pd.Timestamp.now(tz="UTC")).tz_convert(tz)
+    day = local.normalize()
+    for _ in range(8):
+        if day.weekday() < 5:
+            _, close_ts = _session_bounds(exchange, day)
+            if close_ts > local:
+                return close_ts.tz_convert("UTC")
+        day = day + pd.Timedelta(days=1)
+    return (local + pd.Timedelta(days=1)).tz_convert("UTC")
+
+
+def data_expiry(tickers: List[str], intraday: bool = True) -> pd.Timestamp:
+    """
+    Expiration (UTC) d'une entrée couvrant ces tickers : quelques minutes si une
+    de leurs places est ouverte (barre du jour en cours), sinon la prochaine
+    clôture + délai de publication EOD.
+    """
+    now = pd.Timestamp.now(tz="UTC")
+    exchanges = {ticker_exchange(t) for t in tickers} or {"US"}
+    if intraday and any(market_is_open(e, now) for e in exchanges):
+        return now + INTRADAY_TTL
+    # juste après une clôture, la barre du jour n'est pas encore publiée :
+    # on vise cette clôture-là + délai, pas celle du lendemain
+    return min(next_close(e, now - EOD_PUBLISH_DELAY) for e in exchanges) + EOD_PUBLISH_DELAY
+
+
+def _estimate_bytes(value) -> int:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        try:
+            return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) \
+                else int(value.memory_usage(deep=True))
+        except Exception:
+            return sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_bytes(v) for v in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_bytes(k) + _estimate_bytes(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+def _copy_cached(value):
+    # même contrat que st.cache_data : l'appelant reçoit sa propre copie
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy_cached(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _copy_cached(v) for k, v in value.items()}
+    return value
+
+
+class PolicyCache:
+    """Cache process-wide : LRU borné en octets, chaque entrée porte sa propre expiration."""
+
+    def __init__(self, max_bytes: int = DATA_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Tuple, Tuple[object, pd.Timestamp, int]]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[Tuple, threading.Lock] = {}
+
+    def get(self, key: Tuple) -> Tuple[bool, object]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at, size = entry
+            if pd.Timestamp.now(tz="UTC") >= expires_at:
+                del self._data[key]
+                self._bytes -= size
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def put(self, key: Tuple, value, expires_at: pd.Timestamp) -> None:
+        size = _estimate_bytes(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if size > self.max_bytes:
+                return
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._data:
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self._bytes -= evicted
+
+    def invalidate(self, predicate: Callable[[Tuple], bool]) -> int:
+        with self._lock:
+            keys = [k for k in self._data if predicate(k)]
+            for k in keys:
+                self._bytes -= self._data.pop(k)[2]
+            return len(keys)
+
+    def key_lock(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            return self._inflight.setdefault(key, threading.Lock())
+
+    def release_key_lock(self, key: Tuple) -> None:
+        with self._lock:
+            lock = self._inflight.get(key)
+            if lock is not None and not lock.locked():
+                del self._inflight[key]
+
+    @contextmanager
+    def claim(self, keys: List[Tuple]):
+        """Verrouille plusieurs clés (ordre stable : pas d'interblocage entre sessions)."""
+        held: List[Tuple[Tuple, threading.Lock]] = []
+        try:
+            for key in sorted(set(keys), key=repr):
+                lock = self.key_lock(key)
+                lock.acquire()
+                held.append((key, lock))
+            yield
+        finally:
+            for key, lock in reversed(held):
+                lock.release()
+                self.release_key_lock(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+@st.cache_resource
+def get_data_cache() -> PolicyCache:
+    return PolicyCache(DATA_CACHE_MAX_BYTES)
+
+
+def cached_call(key: Tuple, expires_fn: Callable[[object], pd.Timestamp], compute: Callable[[], object]):
+    cache = get_data_cache()
+    hit, value = cache.get(key)
+    if hit:
+        return _copy_cached(value)
+    # Une seule session calcule une clé donnée, les autres attendent son résultat
+    try:
+        with cache.key_lock(key):
+            hit, value = cache.get(key)
+            if not hit:
+                value = compute()
+                cache.put(key, value, expires_fn(value))
+    finally:
+        cache.release_key_lock(key)
+    return _copy_cached(value)
+
+
+# =========================================================
+# FALLBACK PER TICKER
+# =========================================================
+ProviderFn = Callable[[str, str, bool], pd.Series]
+
+
+def provider_twelve(ticker: str, period: str, auto_adjust: bool) -> pd.Series:
+    _ = auto_adjust
+    return fetch_twelve_single(ticker, period)
+
+
+def provider_finnhub(ticker: str, period: str, auto_adjust: bool) -> pd.Series:
+    _ = auto_adjust
+    return fetch_finnhub_single(ticker, period)
+
+
+def provider_yahoo(ticker: str, period: str, auto_adjust: bool) -> pd.Series:
+    return fetch_yfinance_single(ticker, period, auto_adjust)
 
 
 def get_provider_chain(source_mode: str) -> List[Tuple[str, ProviderFn]]:
     if source_mode.startswith("Yahoo"):
-        return [("yfinance", provider_yahoo)]
-    if source_mode.startswith("Finnhub"):
-        return [("finnhub", provider_finnhub)]
-    if source_mode.startswith("Twelve"):
-        return [("twelve data", provider_twelve)]
-    return [
-        ("yfinance", provider_yahoo),
-        ("finnhub", provider_finnhub),
-        ("twelve data", provider_twelve),
-    ]
+        chain = [("yfinance", provider_yahoo)]
+    elif source_mode.startswith("Finnhub"):
+        chain = [("finnhub", provider_finnhub)]
+    elif source_mode.startswith("Twelve"):
+        chain = [("twelve data", provider_twelve)]
+    else:
+        chain = [
+            ("yfinance", provider_yahoo),
+            ("finnhub", provider_finnhub),
+            ("twelve data", provider_twelve),
+        ]
+    # Providers en pause (429 / timeouts répétés) : relégués en fin de chaîne ;
+    # ils ne sont pas sollicités mais leur historique stocké reste servi
+    breaker = get_circuit_breaker()
+    return sorted(chain, key=lambda item: breaker.is_open(item[0]))
+
+
+BulkProviderFn = Callable[[List[str], str, bool], Dict[str, pd.Series]]
+
+# Providers capables de charger tout le panier en une requête
+BULK_PROVIDERS: Dict[str, BulkProviderFn] = {
+    "yfinance": fetch_yfinance_bulk,
+    "twelve data": fetch_twelve_batch,
+}
+
+
+# Nombre max de tickers chargés en parallèle (1 = mode séquentiel historique)
+PRICE_FETCH_WORKERS = 8
+
+# Hedging : si le provider en cours n'a pas répondu après sa p90 observée,
+# on lance le suivant en parallèle et on garde la première série valide.
+HEDGE_DEFAULT_BUDGET_S = 4.0   # tant que la p90 n'est pas encore connue
+HEDGE_MIN_BUDGET_S = 0.5
+
+
+@st.cache_resource
+def get_hedge_executor() -> ThreadPoolExecutor:
+    # Pool dédié aux appels provider "feuilles" (ne soumet jamais de sous-tâche)
+    return ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+
+
+def hedge_budget(provider: str) -> float:
+    p90 = get_provider_latency().quantile(provider, 0.9)
+    if p90 is None:
+        return HEDGE_DEFAULT_BUDGET_S
+    return max(HEDGE_MIN_BUDGET_S, p90)
+
+
+def fetch_ticker_with_chain(
+    ticker: str,
+    chain: List[Tuple[str, ProviderFn]],
+    period: str,
+    auto_adjust: bool,
+) -> Tuple[pd.Series, str]:
+    for name, fn in chain:
+        try:
+            s = fetch_series_stored(name, fn, ticker, period, auto_adjust)
+            if s is not None and not s.empty:
+                return s, name
+        except Exception:
+            continue
+    return pd.Series(dtype=float), "none"
+
+
+def fetch_ticker_hedged(
+    ticker: str,
+    chain: List[Tuple[str, ProviderFn]],
+    period: str,
+    auto_adjust: bool,
+) -> Tuple[pd.Series, str]:
+    if len(chain) <= 1:
+        return fetch_ticker_with_chain(ticker, chain, period, auto_adjust)
+    pool = get_hedge_executor()
+    order = {name: i for i, (name, _) in enumerate(chain)}
+
+    def _call(name: str, fn: ProviderFn) -> pd.Series:
+        try:
+            return fetch_series_stored(name, fn, ticker, period, auto_adjust)
+        except Exception:
+            return pd.Series(dtype=float)
+
+    running: Dict = {}
+    next_idx = 0
+
+    def _launch() -> None:
+        nonlocal next_idx
+        name, fn = chain[next_idx]
+        running[pool.submit(_call, name, fn)] = name
+        next_idx += 1
+
+    _launch()
+    while running:
+        last_name = chain[next_idx - 1][0]
+        budget = hedge_budget(last_name) if next_idx < len(chain) else None
+        done, _ = wait(list(running), timeout=budget, return_when=FIRST_COMPLETED)
+        if not done:
+            # provider lent : requête couverte sur le suivant de la chaîne
+            _launch()
+            continue
+        # à égalité, on respecte l'ordre de la chaîne
+        for f in sorted(done, key=lambda f: order[running[f]]):
+            name = running.pop(f)
+            s = f.result()
+            if s is not None and not s.empty:
+                for loser in running:
+                    loser.cancel()
+                return s, name
+        if not running and next_idx < len(chain):
+            _launch()
+    return pd.Series(dtype=float), "none"
+
+
+def _bulk_stage_hedged(
+    head_name: str,
+    tickers: List[str],
+    rest: List[Tuple[str, ProviderFn]],
+    period: str,
+    auto_adjust: bool,
+    max_workers: int,
+) -> Tuple[Dict[str, Tuple[pd.Series, str]], List[str]]:
+    """
+    Bulk du provider de tête, couvert par la chaîne par ticker s'il dépasse son budget.
+    Renvoie (résultats, tickers encore à charger par la suite de la chaîne).
+    """
+    results: Dict[str, Tuple[pd.Series, str]] = {}
+    bulk_key = f"{head_name} bulk"
+    t0 = time.monotonic()
+    bulk_f = get_hedge_executor().submit(
+        fetch_bulk_stored, head_name, BULK_PROVIDERS[head_name], tickers, period, auto_adjust
+    )
+    try:
+        bulk = bulk_f.result(timeout=hedge_budget(bulk_key))
+        get_provider_latency().record(bulk_key, time.monotonic() - t0)
+        for t, s in bulk.items():
+            if s is not None and not s.empty:
+                results[t] = (s, head_name)
+        return results, [t for t in tickers if t not in results]
+    except FuturesTimeout:
+        pass
+    except Exception:
+        return results, list(tickers)
+
+    # Bulk trop lent : on lance la suite de la chaîne pour chaque ticker et on
+    # garde, ticker par ticker, la première série valide qui arrive.
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers))))
+    per_ticker = {pool.submit(fetch_ticker_hedged, t, rest, period, auto_adjust): t for t in tickers}
+    try:
+        for f in as_completed(list(per_ticker) + [bulk_f]):
+            if f is bulk_f:
+                try:
+                    bulk = f.result()
+                    get_provider_latency().record(bulk_key, time.monotonic() - t0)
+                except Exception:
+                    bulk = {}
+                for t, s in bulk.items():
+                    if t not in results and s is not None and not s.empty:
+                        results[t] = (s, head_name)
+            else:
+                t = per_ticker[f]
+                s, used = f.result()
+                if t not in results and s is not None and not s.empty:
+                    results[t] = (s, used)
+            if len(results) == len(tickers):
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results, []
+
+
+@st.cache_resource
+def get_period_high_water() -> Dict[Tuple[str, bool, str], str]:
+    # (ticker, ajusté, source) -> période la plus longue déjà chargée (tout le process)
+    return {}
+
+
+def canonical_period(keys: List[Tuple[str, bool, str]], period: str) -> str:
+    """Plus longue période entre la demande et ce qui a déjà été chargé pour ces clés."""
+    hwm = get_period_high_water()
+    canonical = max([period] + [hwm.get(k, period) for k in keys], key=period_rank)
+    for k in keys:
+        hwm[k] = canonical
+    return canonical
 
 
-@st.cache_data
 def load_prices_per_ticker(
     tickers: List[str],
     period: str,
     auto_adjust: bool,
     source_mode: str,
+    max_workers: int = PRICE_FETCH_WORKERS,
+    hedge: bool = False,
 ) -> Tuple[pd.DataFrame, Dict[str, str]]:
     tickers = [t.upper() for t in tickers if str(t).strip()]
+    cache = get_data_cache()
+    results: Dict[str, Tuple[pd.Series, str]] = {}
+
+    # Cache par ticker : ajouter / réordonner un symbole ne coûte qu'un fetch.
+    # Chaque ticker garde un historique canonique (le plus long demandé) ;
+    # l'horizon affiché est découpé dedans.
+    missing_by_period: Dict[str, List[str]] = {}
+    for t in tickers:
+        canonical = canonical_period([(t, bool(auto_adjust), source_mode)], period)
+        hit, value = cache.get(("price", t, canonical, bool(auto_adjust), source_mode))
+        if hit:
+            results[t] = value
+        else:
+            missing_by_period.setdefault(canonical, []).append(t)
+
+    breaker = get_circuit_breaker()
+    paused = any(breaker.is_open(name) for name, _ in get_provider_chain(source_mode))
+    for canonical, group in missing_by_period.items():
+        keys = {t: ("price", t, canonical, bool(auto_adjust), source_mode) for t in group}
+        # Une seule session charge un ticker donné, les autres attendent son résultat
+        with cache.claim(list(keys.values())):
+            todo: List[str] = []
+            for t in group:
+                hit, value = cache.get(keys[t])
+                if hit:
+                    results[t] = value
+                else:
+                    todo.append(t)
+            if not todo:
+                continue
+            fetched = _fetch_prices_basket(todo, canonical, auto_adjust, source_mode, max_workers, hedge)
+            for t in todo:
+                s, used = fetched.get(t, (pd.Series(dtype=float), "none"))
+                results[t] = (s, used)
+                if s.empty and paused:
+                    # vide parce qu'un provider est en pause : pas mis en cache
+                    continue
+                expires_at = data_expiry([t]) if not s.empty else pd.Timestamp.now(tz="UTC") + EMPTY_RESULT_TTL
+                cache.put(keys[t], (s, used), expires_at)
+
     source_map: Dict[str, str] = {}
     series_list: List[pd.Series] = []
-    chain = get_provider_chain(source_mode)
     for t in tickers:
-        used = "none"
-        s_final = pd.Series(dtype=float)
-        for name, fn in chain:
-            try:
-                s = fn(t, period, auto_adjust)
-                if s is not None and not s.empty:
-                    s_final = s
-                    used = name
-                    break
-            except Exception:
-                continue
+        s_final, used = results.get(t, (pd.Series(dtype=float), "none"))
         source_map[t] = used
         if s_final is not None and not s_final.empty:
             series_list.append(s_final.rename(t))
@@ -2853,70 +4524,668 @@ def load_prices_per_ticker(
     return df, source_map
 
 
+def _fetch_prices_basket(
+    tickers: List[str],
+    period: str,
+    auto_adjust: bool,
+    source_mode: str,
+    max_workers: int = PRICE_FETCH_WORKERS,
+    hedge: bool = False,
+) -> Dict[str, Tuple[pd.Series, str]]:
+    """(série, provider utilisé) par ticker, via bulk puis fallback par ticker."""
+    chain = get_provider_chain(source_mode)
+    results: Dict[str, Tuple[pd.Series, str]] = {}
+
+    # 1) Provider de tête en bulk (1 requête pour tout le panier)
+    pending = list(tickers)
+    if chain and len(pending) > 1 and chain[0][0] in BULK_PROVIDERS:
+        head_name = chain[0][0]
+        if hedge and len(chain) > 1:
+            staged, pending = _bulk_stage_hedged(head_name, pending, chain[1:], period, auto_adjust, max_workers)
+            results.update(staged)
+        else:
+            try:
+                bulk = fetch_bulk_stored(head_name, BULK_PROVIDERS[head_name], pending, period, auto_adjust)
+            except Exception:
+                bulk = {}
+            for t, s in bulk.items():
+                if s is not None and not s.empty:
+                    results[t] = (s, head_name)
+            pending = [t for t in pending if t not in results]
+        chain = chain[1:]
+
+    # 2) Fallback par ticker uniquement pour ceux revenus vides.
+    # Chaque ticker déroule sa propre chaîne : le temps total suit le
+    # ticker le plus lent, pas la somme.
+    def _one(t: str) -> Tuple[pd.Series, str]:
+        if hedge:
+            return fetch_ticker_hedged(t, chain, period, auto_adjust)
+        return fetch_ticker_with_chain(t, chain, period, auto_adjust)
+
+    workers = max(1, min(int(max_workers or 1), len(pending)))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results.update(zip(pending, pool.map(_one, pending)))
+    else:
+        results.update((t, _one(t)) for t in pending)
+    return results
+
+
 # =========================================================
 # BENCHMARK (Indice)
 # =========================================================
-@st.cache_data
 def fetch_benchmark_series(ticker: str, period: str, auto_adjust: bool) -> pd.Series:
     if not ticker:
         return pd.Series(dtype=float)
-    return fetch_yfinance_single(ticker, period, auto_adjust)
+    canonical = canonical_period([(ticker.upper(), bool(auto_adjust), "benchmark")], period)
+    return filter_period_series(_fetch_benchmark_canonical(ticker, canonical, auto_adjust), period)
+
+
+def _fetch_benchmark_canonical(ticker: str, period: str, auto_adjust: bool) -> pd.Series:
+    return cached_call(
+        ("benchmark", ticker.upper(), period, bool(auto_adjust)),
+        lambda s: data_expiry([ticker]) if not s.empty else pd.Timestamp.now(tz="UTC") + EMPTY_RESULT_TTL,
+        lambda: fetch_series_stored("yfinance", provider_yahoo, ticker, period, auto_adjust),
+    )
 
 
 # =========================================================
 # FUNDAMENTALS
 # =========================================================
-@st.cache_data
-def load_fundamentals(tickers: List[str]) -> pd.DataFrame:
-    rows = []
+def load_fundamentals(
+    tickers: List[str],
+    wait_ms: int = RATE_LIMIT_WAIT_MS,
+    max_fetch: Optional[int] = None,
+) -> pd.DataFrame:
+    # Une entrée de cache par ticker, rafraîchie une fois par séance.
+    # wait_ms=0 : fail-fast, seuls les jetons de quota disponibles sont utilisés
+    # max_fetch : nombre max de tickers interrogés (les autres restent au store)
+    cache = get_data_cache()
+    rows: Dict[str, Dict] = {}
+    missing: List[str] = []
     for t in tickers:
-        profile = {}
-        metric = {}
+        hit, row = cache.get(("fund", t))
+        if hit:
+            rows[t] = dict(row)
+        else:
+            missing.append(t)
+    if missing:
+        # Une seule session charge un ticker donné, les autres attendent son résultat
+        with cache.claim([("fund", t) for t in missing]):
+            todo: List[str] = []
+            for t in missing:
+                hit, row = cache.get(("fund", t))
+                if hit:
+                    rows[t] = dict(row)
+                else:
+                    todo.append(t)
+            fetched, stale = _fetch_fundamentals(todo, wait_ms=wait_ms, max_fetch=max_fetch) \
+                if todo else (pd.DataFrame(), [])
+            for t in todo:
+                row = fetched.loc[t].to_dict() if t in fetched.index else {}
+                # ligne vide ou payload périmé / à moitié échoué : on réessaie rapidement
+                if t not in stale and (row.get("Nom") or pd.notna(row.get("Market Cap"))):
+                    expires_at = data_expiry([t], intraday=False)
+                else:
+                    expires_at = pd.Timestamp.now(tz="UTC") + EMPTY_RESULT_TTL
+                cache.put(("fund", t), row, expires_at)
+                rows[t] = dict(row)
+    return pd.DataFrame([{"Ticker": t, **rows.get(t, {})} for t in tickers]).set_index("Ticker")
+
+
+# Payloads bruts Finnhub (profile2 + metric complet) conservés avec leur date :
+# de nouvelles colonnes de ratios se construisent sans refetch.
+FUNDAMENTALS_STORE_DIR = "fundamentals_store"
+FUNDAMENTALS_MAX_AGE = pd.Timedelta(hours=24)
+# Date d'un payload incomplet sans version antérieure : toujours à rafraîchir
+FUNDAMENTALS_STALE_AT = "1970-01-01T00:00:00"
+
+
+@st.cache_resource
+def ensure_fundamentals_table() -> bool:
+    if engine is None:
+        return False
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                create table if not exists fundamentals_raw (
+                    ticker text primary key,
+                    profile jsonb not null,
+                    metric jsonb not null,
+                    fetched_at timestamptz not null default now()
+                )
+            """))
+        return True
+    except Exception:
+        return False
+
+
+def _fundamentals_fresh(payload: Optional[Dict], now: pd.Timestamp) -> bool:
+    try:
+        ts = pd.Timestamp((payload or {}).get("fetched_at"))
+    except Exception:
+        return False
+    return not pd.isna(ts) and now - ts <= FUNDAMENTALS_MAX_AGE
+
+
+def _fundamentals_path(ticker: str) -> str:
+    safe = "".join(ch if ch.isalnum() else "_" for ch in ticker.upper())
+    return os.path.join(FUNDAMENTALS_STORE_DIR, f"{safe}.json")
+
+
+def fundamentals_store_read(tickers: List[str]) -> Dict[str, Dict]:
+    """Payloads stockés par ticker : disque local d'abord, puis Postgres partagé."""
+    out: Dict[str, Dict] = {}
+    for t in tickers:
+        path = _fundamentals_path(t)
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    payload = json.load(f)
+                if isinstance(payload, dict):
+                    out[t] = payload
+            except Exception:
+                pass
+    now = pd.Timestamp.utcnow().tz_localize(None)
+    stale = [t for t in tickers if not _fundamentals_fresh(out.get(t), now)]
+    if stale and ensure_fundamentals_table():
         try:
-            r = requests.get(
-                f"https://finnhub.io/api/v1/stock/profile2?symbol={t}&token={FINNHUB_API_KEY}",
-                timeout=15,
-            )
-            if r.status_code == 200:
-                profile = r.json() or {}
+            with engine.connect() as conn:
+                res = conn.execute(text("""
+                    select ticker, profile, metric, fetched_at from fundamentals_raw
+                    where ticker = any(:tks)
+                """), {"tks": [t.upper() for t in stale]}).fetchall()
+            for tk, profile, metric, fetched_at in res:
+                ts = pd.Timestamp(fetched_at)
+                ts = ts.tz_convert(None) if ts.tzinfo is not None else ts
+                if _fundamentals_fresh(out.get(tk), now):
+                    continue
+                payload = {"ticker": tk, "profile": profile or {}, "metric": metric or {}, "fetched_at": ts.isoformat()}
+                out[tk] = payload
+                _fundamentals_write_local(tk, payload)
         except Exception:
             pass
+    return out
+
+
+def _fundamentals_write_local(ticker: str, payload: Dict) -> None:
+    path = _fundamentals_path(ticker)
+    try:
+        os.makedirs(FUNDAMENTALS_STORE_DIR, exist_ok=True)
+        tmp = f"{path}.{secrets.token_hex(4)}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+def fundamentals_store_write(payloads: Dict[str, Dict]) -> None:
+    for t, payload in payloads.items():
+        _fundamentals_write_local(t, payload)
+    if not payloads or not ensure_fundamentals_table():
+        return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                insert into fundamentals_raw (ticker, profile, metric, fetched_at)
+                values (:tk, cast(:profile as jsonb), cast(:metric as jsonb), :fetched_at)
+                on conflict (ticker) do update
+                set profile = excluded.profile,
+                    metric = excluded.metric,
+                    fetched_at = excluded.fetched_at
+            """), [
+                {
+                    "tk": t.upper(),
+                    "profile": json.dumps(p.get("profile", {})),
+                    "metric": json.dumps(p.get("metric", {})),
+                    "fetched_at": p.get("fetched_at"),
+                }
+                for t, p in payloads.items()
+            ])
+    except Exception:
+        pass
+
+
+def fetch_fundamentals_payloads(
+    tickers: List[str],
+    wait_ms: int = RATE_LIMIT_WAIT_MS,
+    previous: Optional[Dict[str, Dict]] = None,
+) -> Dict[str, Dict]:
+    # profile2 + metric pour tous les tickers, en une seule vague concurrente
+    if not FINNHUB_API_KEY or not tickers:
+        return {}
+    previous = previous or {}
+    reqs: List[ProviderRequest] = []
+    for t in tickers:
+        reqs.append(("finnhub", "https://finnhub.io/api/v1/stock/profile2",
+                     {"symbol": t, "token": FINNHUB_API_KEY}))
+        reqs.append(("finnhub", "https://finnhub.io/api/v1/stock/metric",
+                     {"symbol": t, "metric": "all", "token": FINNHUB_API_KEY}))
+    payloads = fetch_json_many(reqs, timeout=15, wait_ms=wait_ms)
+    fetched_at = pd.Timestamp.utcnow().tz_localize(None).isoformat()
+    out: Dict[str, Dict] = {}
+    for i, t in enumerate(tickers):
+        profile, metric = payloads[2 * i], payloads[2 * i + 1]
+        # échec réseau / quota : rien à stocker, on garde l'ancien payload
+        if profile is None and metric is None:
+            continue
+        old = previous.get(t) or {}
+        if profile is None or metric is None:
+            # une seule moitié reçue : fusion avec l'ancienne moitié, et l'ancienne
+            # date conservée pour que le payload reste à rafraîchir
+            out[t] = {
+                "ticker": t,
+                "profile": profile if isinstance(profile, dict) else old.get("profile") or {},
+                "metric": metric if isinstance(metric, dict) else old.get("metric") or {},
+                "fetched_at": old.get("fetched_at") or FUNDAMENTALS_STALE_AT,
+            }
+            continue
+        out[t] = {
+            "ticker": t,
+            "profile": profile if isinstance(profile, dict) else {},
+            "metric": metric if isinstance(metric, dict) else {},
+            "fetched_at": fetched_at,
+        }
+    return out
+
+
+def fundamentals_row(ticker: str, payload: Dict) -> Dict:
+    profile = payload.get("profile") or {}
+    metric = (payload.get("metric") or {}).get("metric") or {}
+    if not isinstance(metric, dict):
+        metric = {}
+    raw_mcap = profile.get("marketCapitalization")
+    return {
+        "Ticker": ticker,
+        "Nom": profile.get("name") or "",
+        "Secteur (API)": profile.get("finnhubIndustry") or "",
+        "Industrie (API)": profile.get("finnhubIndustry") or "",
+        "Pays": profile.get("country") or "",
+        "Devise": profile.get("currency") or "",
+        "Exchange": profile.get("exchange") or "",
+        "Market Cap": raw_mcap * 1_000_000 if raw_mcap is not None else None,
+        "P/E (trailing)": metric.get("peBasicExclExtraTTM"),
+        "P/B": metric.get("pbQuarterly"),
+        "ROE": metric.get("roeTTM"),
+        "Marge nette": metric.get("netProfitMarginAnnual"),
+        "Dette/Capitaux": metric.get("totalDebt/totalEquityQuarterly"),
+        "Div. Yield": metric.get("dividendYieldIndicatedAnnual"),
+        "Beta": metric.get("beta"),
+        "EPS (trailing)": metric.get("epsAnnual"),
+        "52w High": metric.get("52WeekHigh"),
+        "52w Low": metric.get("52WeekLow"),
+        "Reco (brut)": None,
+        "Reco moyenne": None,
+        "Nb analystes": None,
+    }
+
+
+def _fetch_fundamentals(
+    tickers: List[str],
+    wait_ms: int = RATE_LIMIT_WAIT_MS,
+    max_fetch: Optional[int] = None,
+) -> Tuple[pd.DataFrame, List[str]]:
+    """Lignes de fondamentaux + tickers dont le payload reste périmé ou incomplet."""
+    stored = fundamentals_store_read(tickers)
+    now = pd.Timestamp.utcnow().tz_localize(None)
+    stale = [t for t in tickers if not _fundamentals_fresh(stored.get(t), now)]
+    if max_fetch is not None:
+        stale = stale[:max(0, max_fetch)]
+    fresh = fetch_fundamentals_payloads(stale, wait_ms=wait_ms, previous=stored)
+    fundamentals_store_write(fresh)
+    stored.update(fresh)
+    rows = [fundamentals_row(t, stored.get(t, {})) for t in tickers]
+    still_stale = [t for t in tickers if not _fundamentals_fresh(stored.get(t), now)]
+    return pd.DataFrame(rows).set_index("Ticker"), still_stale
+
+
+# =========================================================
+# ANALYST SENTIMENT (recommandations + objectifs de cours)
+# =========================================================
+ANALYST_TTL = pd.Timedelta(hours=6)
+
+
+def analyst_sentiment_from_payloads(reco_list, target) -> Dict:
+    out = {
+        "reco_key": None,
+        "reco_mean": None,
+        "reco_n": None,
+        "target_mean": None,
+        "target_high": None,
+        "target_low": None,
+    }
+    if isinstance(reco_list, list) and reco_list and isinstance(reco_list[0], dict):
+        latest = reco_list[0]
+        sb = latest.get("strongBuy", 0) or 0
+        b = latest.get("buy", 0) or 0
+        h = latest.get("hold", 0) or 0
+        sl = latest.get("sell", 0) or 0
+        ss = latest.get("strongSell", 0) or 0
+        reco_n = sb + b + h + sl + ss
+        out["reco_n"] = reco_n
+        if reco_n > 0:
+            reco_mean = (1 * sb + 2 * b + 3 * h + 4 * sl + 5 * ss) / reco_n
+            out["reco_mean"] = reco_mean
+            if reco_mean <= 1.5:
+                out["reco_key"] = "strong_buy"
+            elif reco_mean <= 2.5:
+                out["reco_key"] = "buy"
+            elif reco_mean <= 3.5:
+                out["reco_key"] = "hold"
+            elif reco_mean <= 4.5:
+                out["reco_key"] = "sell"
+            else:
+                out["reco_key"] = "strong_sell"
+    if isinstance(target, dict):
+        out["target_mean"] = target.get("targetMean")
+        out["target_high"] = target.get("targetHigh")
+        out["target_low"] = target.get("targetLow")
+    return out
+
+
+def load_analyst_sentiment_many(tickers: List[str]) -> Dict[str, Dict]:
+    """Sentiment analystes par ticker (cache de quelques heures), manquants chargés en parallèle."""
+    tickers = [t.upper() for t in tickers if str(t).strip()]
+    cache = get_data_cache()
+    out: Dict[str, Dict] = {}
+    missing: List[str] = []
+    for t in tickers:
+        hit, value = cache.get(("analyst", t))
+        if hit:
+            out[t] = dict(value)
+        else:
+            missing.append(t)
+    if not missing or not FINNHUB_API_KEY:
+        return out
+    reqs: List[ProviderRequest] = []
+    for t in missing:
+        reqs.append(("finnhub", "https://finnhub.io/api/v1/stock/recommendation",
+                     {"symbol": t, "token": FINNHUB_API_KEY}))
+        reqs.append(("finnhub", "https://finnhub.io/api/v1/stock/price-target",
+                     {"symbol": t, "token": FINNHUB_API_KEY}))
+    payloads = fetch_json_many(reqs, timeout=15)
+    now = pd.Timestamp.now(tz="UTC")
+    for i, t in enumerate(missing):
+        reco_list, target = payloads[2 * i], payloads[2 * i + 1]
+        value = analyst_sentiment_from_payloads(reco_list, target)
+        # échec réseau / quota : on réessaie vite plutôt que de figer un vide
+        ttl = EMPTY_RESULT_TTL if reco_list is None and target is None else ANALYST_TTL
+        cache.put(("analyst", t), value, now + ttl)
+        out[t] = dict(value)
+    return out
+
+
+# =========================================================
+# WARM-UP (presets SECTORS préchargés en tâche de fond)
+# =========================================================
+# Périodes préchauffées ; la plus longue passe en premier, les autres sont
+# découpées dedans (période canonique) sans nouvel appel
+WARMUP_PERIODS = ["1y", "5y"]
+WARMUP_SOURCE_MODE = "Auto (Yahoo → Finnhub → Twelve Data)"
+WARMUP_AUTO_ADJUST = True
+WARMUP_WORKERS = 2
+# Marge après clôture + délai de publication EOD avant de relancer
+WARMUP_AFTER_CLOSE = pd.Timedelta(minutes=5)
+# Fondamentaux : tickers par vague, et part du quota laissée aux utilisateurs
+WARMUP_FUND_CHUNK = 5
+WARMUP_RATE_RESERVE = 0.5
+WARMUP_HEADROOM_MAX_WAIT_S = 300
+
+
+class WarmupScheduler:
+    """
+    Précharge prix, benchmarks et fondamentaux des presets au démarrage puis
+    peu après chaque clôture de place concernée, dans les caches partagés
+    (PolicyCache + stores). Un seul thread de fond par process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.presets: Dict[str, List[str]] = {}
+        self.benchmarks: List[str] = []
+        self.last_run: Optional[pd.Timestamp] = None
+        self.next_run: Optional[pd.Timestamp] = None
+
+    def start(self, presets: Dict[str, List[str]], benchmarks: List[str]) -> None:
+        with self._lock:
+            self.presets = {k: [t.upper() for t in v] for k, v in presets.items()}
+            self.benchmarks = [b for b in benchmarks if b]
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _all_tickers(self) -> List[str]:
+        return list(dict.fromkeys(t for ts in self.presets.values() for t in ts))
+
+    def next_warmup(self, now: Optional[pd.Timestamp] = None) -> pd.Timestamp:
+        """Prochaine clôture d'une des places des presets, + publication EOD + marge."""
+        now = now if now is not None else pd.Timestamp.now(tz="UTC")
+        exchanges = {ticker_exchange(t) for t in self._all_tickers() + self.benchmarks} or {"US"}
+        return min(next_close(e, now) for e in exchanges) + EOD_PUBLISH_DELAY + WARMUP_AFTER_CLOSE
+
+    def _wait_headroom(self, provider: str, need: float) -> None:
+        # Attend que le quota du provider garde une réserve pour les utilisateurs
+        bucket = get_rate_limiters().bucket(provider, PROVIDER_API_KEYS.get(provider, ""))
+        if bucket is None:
+            return
+        target = min(bucket.capacity, need + bucket.capacity * WARMUP_RATE_RESERVE)
+        deadline = time.monotonic() + WARMUP_HEADROOM_MAX_WAIT_S
+        while bucket.available() < target and time.monotonic() < deadline and not self._stop.is_set():
+            self._stop.wait(1.0)
+
+    def run_once(self) -> None:
+        # Vue d'accueil (premier preset) d'abord
+        presets = list(self.presets.values())
+        for period in sorted(WARMUP_PERIODS, key=period_rank, reverse=True):
+            for tickers in presets:
+                if self._stop.is_set():
+                    return
+                try:
+                    load_prices_per_ticker(tickers, period, WARMUP_AUTO_ADJUST, WARMUP_SOURCE_MODE,
+                                           max_workers=WARMUP_WORKERS)
+                except Exception:
+                    pass
+            for bm in self.benchmarks:
+                try:
+                    fetch_benchmark_series(bm, period, WARMUP_AUTO_ADJUST)
+                except Exception:
+                    pass
+        if FINNHUB_API_KEY:
+            all_tickers = self._all_tickers()
+            for i in range(0, len(all_tickers), WARMUP_FUND_CHUNK):
+                if self._stop.is_set():
+                    return
+                chunk = all_tickers[i:i + WARMUP_FUND_CHUNK]
+                # profile2 + metric par ticker
+                self._wait_headroom("finnhub", 2 * len(chunk))
+                try:
+                    load_fundamentals(chunk)
+                except Exception:
+                    pass
+        self.last_run = pd.Timestamp.now(tz="UTC")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self.next_run = self.next_warmup()
+            delay = (self.next_run - pd.Timestamp.now(tz="UTC")).total_seconds()
+            self._stop.wait(max(60.0, delay))
+
+
+@st.cache_resource
+def get_warmup_scheduler() -> WarmupScheduler:
+    return WarmupScheduler()
+
+
+# =========================================================
+# SCORING (classement mémoïsé par empreinte des données)
+# =========================================================
+# L'empreinte change dès qu'une entrée change : la durée ne sert qu'à libérer la mémoire
+RANKING_TTL = pd.Timedelta(hours=1)
+FANTAZIA_SCORER = FantaziaScorer()
+
+
+def frame_digest(df) -> str:
+    if df is None or len(df) == 0:
+        return ""
+    try:
+        raw = pd.util.hash_pandas_object(df, index=True).values.tobytes()
+    except Exception:
+        raw = df.to_csv().encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def ranking_fingerprint(
+    prices: pd.DataFrame,
+    fund: pd.DataFrame,
+    benchmark_series: pd.Series,
+    period: str,
+    benchmark_ticker: str,
+    auto_adjust: bool,
+    source_mode: str,
+) -> Tuple:
+    """
+    Tickers, empreinte de tout l'historique (realtime et barres re-basées
+    compris), période, benchmark, version des fondamentaux.
+    """
+    return (
+        "ranking",
+        tuple(prices.columns),
+        frame_digest(prices),
+        period,
+        benchmark_ticker,
+        frame_digest(benchmark_series),
+        bool(auto_adjust),
+        source_mode,
+        frame_digest(fund),
+    )
+
+
+def build_ranking(price_metrics: pd.DataFrame, fund: pd.DataFrame, benchmark_series: pd.Series) -> pd.DataFrame:
+    return FANTAZIA_SCORER.rank(price_metrics, fund, benchmark_series)
+
+
+# =========================================================
+# UNIVERSE SCREENER (univers complet depuis un fichier de constituants)
+# =========================================================
+# Un CSV par univers (ex. sp500.csv, stoxx600.csv) avec une colonne ticker
+UNIVERSE_DIR = "universes"
+UNIVERSE_TICKER_COLUMNS = ("ticker", "symbol", "symbole", "code")
+UNIVERSE_NAME_COLUMNS = ("name", "nom", "company", "security")
+UNIVERSE_SECTOR_COLUMNS = ("sector", "secteur", "gics sector")
+# Tickers par appel bulk
+UNIVERSE_CHUNK = 100
+# Univers : Yahoo en bulk uniquement (les fallbacks par ticker videraient les quotas)
+SCREENER_SOURCE_MODE = "Yahoo Finance (yfinance)"
+SCREENER_PERIODS = ["1y", "3y", "5y"]
+
+
+def list_universes() -> Dict[str, str]:
+    """Libellé -> chemin des fichiers de constituants disponibles."""
+    try:
+        files = sorted(f for f in os.listdir(UNIVERSE_DIR) if f.lower().endswith(".csv"))
+    except Exception:
+        return {}
+    return {os.path.splitext(f)[0].replace("_", " ").upper(): os.path.join(UNIVERSE_DIR, f) for f in files}
+
+
+def _pick_column(df: pd.DataFrame, candidates: Tuple[str, ...]) -> Optional[str]:
+    lower = {str(c).strip().lower(): c for c in df.columns}
+    for c in candidates:
+        if c in lower:
+            return lower[c]
+    return None
+
+
+@st.cache_data(show_spinner=False)
+def load_universe(path: str, mtime: float) -> pd.DataFrame:
+    # mtime dans la clé : fichier remplacé -> relu
+    _ = mtime
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            header = f.readline()
+        sep = max([",", ";", "\t"], key=header.count)
+        raw = pd.read_csv(path, sep=sep, dtype=str, encoding="utf-8-sig")
+    except Exception:
+        return pd.DataFrame()
+    col = _pick_column(raw, UNIVERSE_TICKER_COLUMNS)
+    if col is None:
+        return pd.DataFrame()
+    out = pd.DataFrame({"Ticker": raw[col].fillna("").astype(str).str.strip().str.upper()})
+    name_col = _pick_column(raw, UNIVERSE_NAME_COLUMNS)
+    sector_col = _pick_column(raw, UNIVERSE_SECTOR_COLUMNS)
+    if name_col is not None:
+        out["Nom (univers)"] = raw[name_col].fillna("").astype(str).str.strip()
+    if sector_col is not None:
+        out["Secteur (univers)"] = raw[sector_col].fillna("").astype(str).str.strip()
+    out = out[out["Ticker"] != ""]
+    return out.drop_duplicates("Ticker").set_index("Ticker")
+
+
+def load_universe_prices(
+    tickers: List[str],
+    period: str,
+    auto_adjust: bool,
+    progress: Optional[Callable[[float], None]] = None,
+) -> pd.DataFrame:
+    """Historique de tout l'univers, par paquets bulk (cache par ticker + price store)."""
+    frames: List[pd.DataFrame] = []
+    for i in range(0, len(tickers), UNIVERSE_CHUNK):
+        chunk = tickers[i:i + UNIVERSE_CHUNK]
         try:
-            r = requests.get(
-                f"https://finnhub.io/api/v1/stock/metric?symbol={t}&metric=all&token={FINNHUB_API_KEY}",
-                timeout=15,
-            )
-            if r.status_code == 200:
-                metric = (r.json() or {}).get("metric", {})
+            df, _ = load_prices_per_ticker(chunk, period, auto_adjust, SCREENER_SOURCE_MODE)
         except Exception:
-            pass
+            df = pd.DataFrame()
+        if not df.empty:
+            frames.append(df)
+        if progress is not None:
+            progress(min(1.0, (i + len(chunk)) / max(1, len(tickers))))
+    if not frames:
+        return pd.DataFrame()
+    prices = pd.concat(frames, axis=1).sort_index()
+    return prices.loc[:, ~prices.columns.duplicated()].dropna(how="all")
 
-        raw_mcap = profile.get("marketCapitalization")
-        rows.append({
-            "Ticker": t,
-            "Nom": profile.get("name") or "",
-            "Secteur (API)": profile.get("finnhubIndustry") or "",
-            "Industrie (API)": profile.get("finnhubIndustry") or "",
-            "Pays": profile.get("country") or "",
-            "Devise": profile.get("currency") or "",
-            "Exchange": profile.get("exchange") or "",
-            "Market Cap": raw_mcap * 1_000_000 if raw_mcap is not None else None,
-            "P/E (trailing)": metric.get("peBasicExclExtraTTM"),
-            "P/B": metric.get("pbQuarterly"),
-            "ROE": metric.get("roeTTM"),
-            "Marge nette": metric.get("netProfitMarginAnnual"),
-            "Dette/Capitaux": metric.get("totalDebt/totalEquityQuarterly"),
-            "Div. Yield": metric.get("dividendYieldIndicatedAnnual"),
-            "Beta": metric.get("beta"),
-            "EPS (trailing)": metric.get("epsAnnual"),
-            "52w High": metric.get("52WeekHigh"),
-            "52w Low": metric.get("52WeekLow"),
-            "Reco (brut)": None,
-            "Reco moyenne": None,
-            "Nb analystes": None,
-        })
-    return pd.DataFrame(rows).set_index("Ticker")
 
+def screen_universe(
+    universe: pd.DataFrame,
+    period: str,
+    auto_adjust: bool,
+    progress: Optional[Callable[[float], None]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Classement Fantazia de tout l'univers (z-scores relatifs à l'univers).
+    Fondamentaux : store + fetch fail-fast borné au quota libre (hors réserve
+    utilisateurs), les manquants se complètent aux passages suivants.
+    """
+    tickers = list(universe.index)
+    prices = load_universe_prices(tickers, period, auto_adjust, progress)
+    stats = {"universe": len(tickers), "prices": int(prices.shape[1]), "fundamentals": 0}
+    if prices.empty:
+        return pd.DataFrame(), stats
+    max_fetch: Optional[int] = None
+    bucket = get_rate_limiters().bucket("finnhub", PROVIDER_API_KEYS.get("finnhub", ""))
+    if bucket is not None:
+        # 2 appels par ticker (profile2 + metric), réserve laissée aux sessions
+        spare = bucket.available() - bucket.capacity * WARMUP_RATE_RESERVE
+        max_fetch = max(0, int(spare // 2))
+    fund = load_fundamentals(list(prices.columns), wait_ms=0, max_fetch=max_fetch).reindex(prices.columns)
+    if "Nom" in fund.columns:
+        stats["fundamentals"] = int((fund["Nom"].fillna("") != "").sum())
+    ranking = cached_call(
+        ranking_fingerprint(prices, fund, pd.Series(dtype=float), period, "", auto_adjust, SCREENER_SOURCE_MODE),
+        lambda _: pd.Timestamp.now(tz="UTC") + RANKING_TTL,
+        lambda: FANTAZIA_SCORER.score(prices, fund),
+    )
+    ranking = ranking.join(universe, how="left")
+    return ranking.sort_values("Fantazia Score (%)", ascending=False), stats
 
 
 # =========================================================
@@ -3012,6 +5281,12 @@ price_source_mode = st.sidebar.selectbox(
     index=0
 )
 
+use_hedging = st.sidebar.checkbox(
+    tr("sidebar_hedging"),
+    value=False,
+    help=tr("sidebar_hedging_help"),
+)
+
 use_realtime = st.sidebar.checkbox(
     tr("sidebar_rt"),
     value=False
@@ -3031,6 +5306,9 @@ benchmark_options = {
     "^FCHI (CAC 40)": "^FCHI",
     "^STOXX50E (Euro Stoxx 50)": "^STOXX50E",
 }
+# Préchauffage des presets (idempotent : un seul thread par process)
+get_warmup_scheduler().start(SECTORS, list(benchmark_options.values()))
+
 bm_label = st.sidebar.selectbox(tr("sidebar_benchmark"), list(benchmark_options.keys()), index=0)
 benchmark_ticker = benchmark_options[bm_label]
 
@@ -3050,6 +5328,11 @@ if api_status:
 else:
     st.sidebar.caption(tr("sidebar_api_none"))
 
+_paused_providers = get_circuit_breaker().open_providers()
+if _paused_providers:
+    st.sidebar.caption(tr("sidebar_paused").format(
+        providers=", ".join(pretty_source_name(p) for p in _paused_providers)))
+
 if not is_premium():
     _ac = st.session_state.get("analysis_count", 0)
     _ac_label = f"📊 {_ac} / 10 analyses utilisées aujourd'hui"
@@ -3080,9 +5363,25 @@ prices, source_map = load_prices_per_ticker(
     tickers=tickers,
     period=history_period,
     auto_adjust=use_auto_adjust,
-    source_mode=price_source_mode
+    source_mode=price_source_mode,
+    hedge=use_hedging,
 )
 
+_missing_tickers = [t for t in tickers if t not in prices.columns]
+if _missing_tickers:
+    _neg = get_negative_cache()
+    _missing_parts = []
+    for t in _missing_tickers:
+        reasons = _neg.reasons(t)
+        if reasons and all(r == "unknown" for r in reasons.values()):
+            _missing_parts.append(f"{t} ({tr('missing_unknown_ticker')})")
+        elif reasons:
+            _missing_parts.append(t + " (" + ", ".join(
+                f"{pretty_source_name(p)} : {tr('missing_reason_' + r)}" for p, r in reasons.items()) + ")")
+        else:
+            _missing_parts.append(t)
+    st.warning(tr("missing_history").format(tickers=" · ".join(_missing_parts)))
+
 if prices.empty:
     st.error("Impossible de charger l'historique pour ces tickers.")
     st.stop()
@@ -3096,75 +5395,35 @@ if benchmark_ticker:
     benchmark_series = benchmark_series.dropna()
     benchmark_series = filter_period_series(benchmark_series, history_period)
 
-# Precompute metrics
-perf_1m = rolling_return(prices, 21)
-perf_3m = rolling_return(prices, 63)
-perf_6m = rolling_return(prices, 126)
-perf_1y = calendar_return_years(prices, years=1)
-vol = annualized_vol(prices)
-mdd = max_drawdown(prices)
-
-table_base = fund.copy()
-table_base["Perf 1M"] = perf_1m
-table_base["Perf 3M"] = perf_3m
-table_base["Perf 6M"] = perf_6m
-table_base["Perf 1Y"] = perf_1y
-table_base["Vol annualisée"] = vol
-table_base["Max Drawdown"] = mdd
-
-pe = safe_numeric(table_base, "P/E (trailing)")
-pb = safe_numeric(table_base, "P/B")
-roe = safe_numeric(table_base, "ROE")
-margin = safe_numeric(table_base, "Marge nette")
-de = safe_numeric(table_base, "Dette/Capitaux")
-mom6 = safe_numeric(table_base, "Perf 6M")
-mom1y = safe_numeric(table_base, "Perf 1Y")
-v = safe_numeric(table_base, "Vol annualisée")
-dd = safe_numeric(table_base, "Max Drawdown")
-
-value_score = (-zscore(pe).fillna(0) + -zscore(pb).fillna(0)) / 2
-quality_score = (zscore(roe).fillna(0) + zscore(margin).fillna(0) + -zscore(de).fillna(0)) / 3
-momentum_score = (zscore(mom6).fillna(0) + zscore(mom1y).fillna(0)) / 2
-risk_score = (-zscore(v).fillna(0) + zscore(dd).fillna(0)) / 2
-
-table_base["Score Value"] = value_score
-table_base["Score Quality"] = quality_score
-table_base["Score Momentum"] = momentum_score
-table_base["Score Risk"] = risk_score
-
-table_base["Score Global"] = (
-    0.28 * table_base["Score Value"] +
-    0.30 * table_base["Score Quality"] +
-    0.27 * table_base["Score Momentum"] +
-    0.15 * table_base["Score Risk"]
-)
-
-ranked_all = table_base.copy()
-if "Market Cap" in ranked_all.columns:
-    ranked_all["Market Cap (Mds)"] = ranked_all["Market Cap"].apply(
-        lambda x: x / 1e9 if pd.notna(x) else np.nan
-    )
-score_min = ranked_all["Score Global"].min()
-score_max = ranked_all["Score Global"].max()
-
-if pd.isna(score_min) or pd.isna(score_max) or score_min == score_max:
-    ranked_all["Fantazia Score (%)"] = 50.0
-else:
-    ranked_all["Fantazia Score (%)"] = (
-        (ranked_all["Score Global"] - score_min) / (score_max - score_min) * 100.0
-    )
-
-# Surperformance vs benchmark (1Y) si disponible
-if benchmark_series is not None and not benchmark_series.empty:
-    bm_df = pd.DataFrame({"BM": benchmark_series})
-    bm_1y = calendar_return_years(bm_df, years=1)
-    bm_1y_val = bm_1y.get("BM", np.nan)
-    if not pd.isna(bm_1y_val):
-        ranked_all["Surperf 1Y vs BM (pts)"] = (ranked_all["Perf 1Y"] - bm_1y_val) * 100.0
-    else:
-        ranked_all["Surperf 1Y vs BM (pts)"] = np.nan
+# Realtime best-effort : lecture du bus partagé (aucune I/O côté session)
+rt_data: Dict[str, Tuple[float, pd.Timestamp]] = {}
+rt_enabled = use_realtime and (POLYGON_API_KEY or REALTIME_FEED == "local")
+rt_session_id = st.session_state.setdefault("_rt_session_id", secrets.token_hex(8))
+if rt_enabled:
+    rt_bus = get_realtime_bus()
+    rt_bus.subscribe(rt_session_id, list(prices.columns))
+    rt_data = rt_bus.latest(list(prices.columns))
 else:
-    ranked_all["Surperf 1Y vs BM (pts)"] = np.nan
+    get_realtime_bus().unsubscribe(rt_session_id)
+
+# Prix utilisés pour tout le reste (dernière barre remplacée par le realtime)
+prices_display = prices.copy()
+if rt_data:
+    for t, (p, _) in rt_data.items():
+        if t in prices_display.columns and not prices_display[t].dropna().empty:
+            prices_display.loc[prices_display.index[-1], t] = p
+
+# Precompute metrics : seule la dernière barre change d'un tick à l'autre
+price_metrics = session_price_metrics(prices_display)
+
+# Scoring : mémoïsé sur l'empreinte des entrées, un clic dans un onglet
+# ne relance pas tout le classement
+ranked_all = cached_call(
+    ranking_fingerprint(prices_display, fund, benchmark_series, history_period,
+                        benchmark_ticker, use_auto_adjust, price_source_mode),
+    lambda _: pd.Timestamp.now(tz="UTC") + RANKING_TTL,
+    lambda: build_ranking(price_metrics, fund, benchmark_series),
+)
 
 
 # =========================================================
@@ -3474,8 +5733,9 @@ if is_premium() and _ftz_done is False:
 # =========================================================
 # TABS
 # =========================================================
-tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
+tab1, tab_screener, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
     tr("tab_dashboard"),
+    tr("tab_screener"),
     tr("tab_watchlists"),
     tr("tab_simulator"),
     tr("tab_stock"),
@@ -3500,21 +5760,10 @@ with tab1:
         show_premium_gate("Avec un compte Premium, profitez d'analyses illimitées, d'exports CSV, d'alertes de prix et du FTZ Score personnalisé.")
         st.info("👉 Rendez-vous dans l'onglet 💎 Premium pour découvrir nos offres.")
     else:
-        # Realtime best-effort
-        rt_data: Dict[str, Tuple[float, pd.Timestamp]] = {}
-        if use_realtime and POLYGON_API_KEY:
-            rt_data = fetch_realtime_polygon_batch(list(prices.columns))
-
         if st.button("🔄 Refresh prix (Polygon)"):
-            if use_realtime and POLYGON_API_KEY:
-                rt_data = fetch_realtime_polygon_batch(list(prices.columns))
-
-        # Prix utilisés pour tout le reste
-        prices_display = prices.copy()
-        if rt_data:
-            for t, (p, _) in rt_data.items():
-                if t in prices_display.columns and not prices_display[t].dropna().empty:
-                    prices_display.loc[prices_display.index[-1], t] = p
+            if rt_enabled:
+                get_realtime_bus().refresh()
+                rerun_app()
 
         # Derniers prix & variations journalières
         latest_prices: Dict[str, float] = {}
@@ -4569,19 +6818,11 @@ with tab1:
             if not subs:
                 st.info(tr("mynews_no_subs"))
             else:
-                all_rows = []
-                for t in subs:
-                    df_n = load_news_finnhub(t, days=5, max_items=5)
-                    if not df_n.empty:
-                        df_n = df_n.copy()
-                        df_n["Ticker"] = t
-                        all_rows.append(df_n)
-                if not all_rows:
+                # Tous les abonnements en parallèle, articles dédoublonnés entre tickers
+                news_all = load_news_many(subs, days=5, max_per_ticker=5)
+                if news_all.empty:
                     st.info(tr("mynews_none_recent"))
                 else:
-                    news_all = pd.concat(all_rows, ignore_index=True)
-                    if "datetime" in news_all.columns:
-                        news_all = news_all.sort_values("datetime", ascending=False)
                     max_show = 15
                     count = 0
                     for _, row in news_all.iterrows():
@@ -4610,6 +6851,118 @@ with tab1:
                         count += 1
 
 
+# =========================================================
+# TAB SCREENER — UNIVERS COMPLET
+# =========================================================
+with tab_screener:
+    if st.session_state.get("analysis_limit_reached"):
+        st.warning(tr("scr_limit_reached"))
+        show_premium_gate(tr("scr_premium_gate"))
+    else:
+        st.subheader(tr("scr_title"))
+        universes = list_universes()
+        if not universes:
+            st.info(tr("scr_no_universe").format(dir=UNIVERSE_DIR))
+        else:
+            sc1, sc2, sc3 = st.columns(3)
+            with sc1:
+                uni_label = st.selectbox(tr("scr_universe"), list(universes.keys()), key="scr_universe")
+            with sc2:
+                scr_period = st.selectbox(tr("scr_period"), SCREENER_PERIODS, index=0, key="scr_period")
+            with sc3:
+                scr_top_n = st.number_input(tr("scr_top_n"), min_value=5, max_value=500, value=25, step=5, key="scr_top_n")
+
+            uni_path = universes[uni_label]
+            try:
+                uni_mtime = os.path.getmtime(uni_path)
+            except Exception:
+                uni_mtime = 0.0
+            universe_df = load_universe(uni_path, uni_mtime)
+
+            if universe_df.empty:
+                st.warning(tr("scr_bad_file"))
+            else:
+                st.caption(tr("scr_universe_caption").format(n=len(universe_df)))
+                scr_key = (uni_path, uni_mtime, scr_period, bool(use_auto_adjust))
+                if st.button(tr("scr_run"), key="scr_run"):
+                    scr_bar = st.progress(0.0)
+                    ranking_u, stats_u = screen_universe(
+                        universe_df, scr_period, use_auto_adjust, progress=scr_bar.progress
+                    )
+                    scr_bar.empty()
+                    st.session_state["screener_result"] = {"key": scr_key, "ranking": ranking_u, "stats": stats_u}
+
+                scr_res = st.session_state.get("screener_result")
+                if scr_res is None or scr_res.get("key") != scr_key:
+                    st.info(tr("scr_run_hint"))
+                elif scr_res["ranking"].empty:
+                    st.error(tr("scr_no_history"))
+                else:
+                    ranking_u = scr_res["ranking"]
+                    stats_u = scr_res["stats"]
+                    st.caption(tr("scr_coverage").format(**stats_u))
+
+                    sector_col = "Secteur (univers)" if "Secteur (univers)" in ranking_u.columns else "Secteur (API)"
+                    name_col = "Nom (univers)" if "Nom (univers)" in ranking_u.columns else "Nom"
+                    sectors_u = []
+                    if sector_col in ranking_u.columns:
+                        sectors_u = sorted(x for x in ranking_u[sector_col].dropna().unique() if x)
+
+                    sf1, sf2, sf3, sf4 = st.columns(4)
+                    with sf1:
+                        scr_sectors = st.multiselect(tr("scr_sectors"), sectors_u, key="scr_sectors")
+                    with sf2:
+                        scr_min_cap = st.number_input(tr("scr_min_cap"), min_value=0.0, value=0.0, step=1.0, key="scr_min_cap")
+                    with sf3:
+                        scr_max_pe = st.number_input(tr("scr_max_pe"), min_value=0.0, value=0.0, step=1.0, key="scr_max_pe")
+                    with sf4:
+                        scr_min_perf = st.number_input(tr("scr_min_perf"), value=-100.0, step=5.0, key="scr_min_perf")
+                    scr_fund_only = st.checkbox(tr("scr_fund_only"), value=False, key="scr_fund_only")
+
+                    view_u = ranking_u
+                    if scr_sectors and sector_col in view_u.columns:
+                        view_u = view_u[view_u[sector_col].isin(scr_sectors)]
+                    if scr_min_cap > 0 and "Market Cap (Mds)" in view_u.columns:
+                        view_u = view_u[pd.to_numeric(view_u["Market Cap (Mds)"], errors="coerce") >= scr_min_cap]
+                    if scr_max_pe > 0 and "P/E (trailing)" in view_u.columns:
+                        pe_u = pd.to_numeric(view_u["P/E (trailing)"], errors="coerce")
+                        view_u = view_u[(pe_u > 0) & (pe_u <= scr_max_pe)]
+                    if scr_min_perf > -100:
+                        view_u = view_u[pd.to_numeric(view_u["Perf 1Y"], errors="coerce") * 100 >= scr_min_perf]
+                    if scr_fund_only and "Nom" in view_u.columns:
+                        view_u = view_u[view_u["Nom"].fillna("") != ""]
+
+                    if view_u.empty:
+                        st.info(tr("scr_no_match"))
+                    else:
+                        cols_u = [c for c in [
+                            name_col, sector_col, "Market Cap (Mds)", "P/E (trailing)", "Perf 6M", "Perf 1Y",
+                            "Vol annualisée", "Max Drawdown", "Fantazia Score (%)",
+                        ] if c in view_u.columns]
+                        top_u = view_u.head(int(scr_top_n))[cols_u].copy()
+                        for col in ["Perf 6M", "Perf 1Y", "Vol annualisée", "Max Drawdown"]:
+                            if col in top_u.columns:
+                                top_u[col] = (pd.to_numeric(top_u[col], errors="coerce") * 100).round(2)
+                        for col in ["Market Cap (Mds)", "P/E (trailing)", "Fantazia Score (%)"]:
+                            if col in top_u.columns:
+                                top_u[col] = pd.to_numeric(top_u[col], errors="coerce").round(2)
+                        st.caption(tr("scr_result_caption").format(n=len(view_u)))
+                        display_dataframe(top_u)
+
+                        if is_premium():
+                            csv_u = top_u.copy()
+                            csv_u.index.name = "Ticker"
+                            st.download_button(
+                                tr("export_csv"),
+                                data=csv_u.to_csv(sep=";").encode("utf-8"),
+                                file_name=f"screener_{uni_label.lower().replace(' ', '_')}.csv",
+                                mime="text/csv",
+                                key="scr_csv",
+                            )
+                        else:
+                            show_premium_gate(tr("scr_csv_gate"))
+
+
 # =========================================================
 # TAB 2 — WATCHLISTS
 # =========================================================
@@ -5156,56 +7509,15 @@ with tab4:
         title_sent = "Sentiment des analystes" if lang_ui == "fr" else "Analyst sentiment"
         st.markdown("### " + title_sent)
 
-        # On récupère tout d'un coup via Finnhub
-        reco_key = None
-        reco_mean = None
-        reco_n = None
-        target_mean = None
-        target_high = None
-        target_low = None
-
-        try:
-            if FINNHUB_API_KEY:
-                # 1. Recommandations analystes
-                r_reco = requests.get(
-                    f"https://finnhub.io/api/v1/stock/recommendation?symbol={t_selected}&token={FINNHUB_API_KEY}",
-                    timeout=15,
-                )
-                if r_reco.status_code == 200:
-                    reco_list = r_reco.json() or []
-                    if reco_list:
-                        latest = reco_list[0]
-                        sb = latest.get("strongBuy", 0) or 0
-                        b  = latest.get("buy", 0) or 0
-                        h  = latest.get("hold", 0) or 0
-                        s  = latest.get("sell", 0) or 0
-                        ss = latest.get("strongSell", 0) or 0
-                        reco_n = sb + b + h + s + ss
-                        if reco_n > 0:
-                            reco_mean = (1*sb + 2*b + 3*h + 4*s + 5*ss) / reco_n
-                            if reco_mean <= 1.5:
-                                reco_key = "strong_buy"
-                            elif reco_mean <= 2.5:
-                                reco_key = "buy"
-                            elif reco_mean <= 3.5:
-                                reco_key = "hold"
-                            elif reco_mean <= 4.5:
-                                reco_key = "sell"
-                            else:
-                                reco_key = "strong_sell"
-                # 2. Objectifs de cours
-                r_target = requests.get(
-                    f"https://finnhub.io/api/v1/stock/price-target?symbol={t_selected}&token={FINNHUB_API_KEY}",
-                    timeout=15,
-                )
-
-                if r_target.status_code == 200:
-                    tdata = r_target.json() or {}
-                    target_mean = tdata.get("targetMean")
-                    target_high = tdata.get("targetHigh")
-                    target_low  = tdata.get("targetLow")
-        except Exception:
-            pass
+        # Sentiment de tout le panier en une vague parallèle (cache par ticker) :
+        # changer d'action ensuite ne refait aucun appel.
+        sentiment = load_analyst_sentiment_many(list(prices.columns)).get(t_selected, {})
+        reco_key = sentiment.get("reco_key")
+        reco_mean = sentiment.get("reco_mean")
+        reco_n = sentiment.get("reco_n")
+        target_mean = sentiment.get("target_mean")
+        target_high = sentiment.get("target_high")
+        target_low = sentiment.get("target_low")
 
         col_sent, col_target = st.columns([2, 1])
 
@@ -0,0 +1,474 @@
+"""
+Fantazia Score sans Streamlit : métriques de prix vectorisées, sous-scores
+Value / Quality / Momentum / Risk, score global pondéré et score % (min–max
+dans le panier). Importable depuis un worker, un benchmark ou un batch.
+
+    scorer = FantaziaScorer()
+    ranking = scorer.score(prices, fund, benchmark_series)
+"""
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _numeric(df: pd.DataFrame, col: str) -> pd.Series:
+    # colonne absente (fondamentaux partiels) : NaN, neutre dans les z-scores
+    if col not in df.columns:
+        return pd.Series(np.nan, index=df.index, dtype=float)
+    return pd.to_numeric(df[col], errors="coerce")
+
+
+def zscore(s: pd.Series):
+    s = s.astype(float)
+    s_clean = s.dropna()
+    if s_clean.empty:
+        return s * np.nan
+    std = s_clean.std(ddof=0)
+    if std == 0 or np.isnan(std):
+        return s * 0
+    return (s - s_clean.mean()) / std
+
+
+def rolling_return(prices: pd.DataFrame, days: int):
+    if prices.empty or len(prices) <= days:
+        return pd.Series(index=prices.columns, dtype=float)
+    return prices.iloc[-1] / prices.iloc[-days] - 1.0
+
+
+def calendar_return_years(prices: pd.DataFrame, years: int = 1):
+    if prices.empty:
+        return pd.Series(index=prices.columns, dtype=float)
+    values = prices.to_numpy(dtype=float)
+    out = _calendar_return(values, ~np.isnan(values), prices.index, years)
+    return pd.Series(out, index=prices.columns)
+
+
+def annualized_vol(prices: pd.DataFrame):
+    if prices.empty or len(prices) < 20:
+        return pd.Series(index=prices.columns, dtype=float)
+    rets = prices.pct_change().dropna()
+    return rets.std() * np.sqrt(252)
+
+
+def max_drawdown(prices: pd.DataFrame):
+    if prices.empty:
+        return pd.Series(index=prices.columns, dtype=float)
+    values = prices.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    return pd.Series(_max_drawdown(_ffill_2d(values, valid), valid), index=prices.columns)
+
+
+# =========================================================
+# METRICS ENGINE (matrice de prix alignée, une passe NumPy)
+# =========================================================
+# Horizons en lignes (barres), même sémantique que rolling_return
+METRIC_HORIZONS = {"Perf 1M": 21, "Perf 3M": 63, "Perf 6M": 126}
+METRIC_COLUMNS = list(METRIC_HORIZONS) + ["Perf 1Y", "Vol annualisée", "Max Drawdown"]
+VOL_MIN_ROWS = 20
+TRADING_DAYS = 252
+# Lignes 1Y déjà dépassées par tous les tickers avant compactage du tampon
+YEAR_BUFFER_TRIM = 256
+
+
+def _ffill_2d(values: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    # dernière valeur valide par colonne ; NaN avant la première
+    rows = np.where(valid, np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+def _first_last_valid(valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    has = valid.any(axis=0)
+    first = valid.argmax(axis=0)
+    last = valid.shape[0] - 1 - valid[::-1].argmax(axis=0)
+    return has, first, last
+
+
+def _calendar_return(values: np.ndarray, valid: np.ndarray, index: pd.Index, years: int) -> np.ndarray:
+    """Dernier cours / premier cours à partir de (dernière date - `years`), par colonne."""
+    n, m = values.shape
+    out = np.full(m, np.nan)
+    if n == 0:
+        return out
+    target = index[-1] - pd.DateOffset(years=years)
+    start_row = int(index.searchsorted(target, side="left"))
+    if start_row >= n:
+        return out
+    has_after, first_after, _ = _first_last_valid(valid[start_row:])
+    _, _, last = _first_last_valid(valid)
+    cols = np.arange(m)
+    start = values[first_after + start_row, cols]
+    end = values[last, cols]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(has_after, end / start - 1.0, np.nan)
+    return out
+
+
+def _annualized_vol(filled: np.ndarray) -> np.ndarray:
+    # pct_change sur cours propagés, lignes avec un NaN écartées (comme dropna)
+    m = filled.shape[1]
+    if filled.shape[0] < VOL_MIN_ROWS:
+        return np.full(m, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rets = filled[1:] / filled[:-1] - 1.0
+    rets = rets[~np.isnan(rets).any(axis=1)]
+    if rets.shape[0] < 2:
+        return np.full(m, np.nan)
+    return rets.std(axis=0, ddof=1) * np.sqrt(TRADING_DAYS)
+
+
+def _max_drawdown(filled: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    peak = np.fmax.accumulate(filled, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        draw = filled / peak - 1.0
+    out = np.where(np.isnan(draw), np.inf, draw).min(axis=0)
+    return np.where(valid.any(axis=0), out, np.nan)
+
+
+def compute_price_metrics(prices: pd.DataFrame) -> pd.DataFrame:
+    """
+    Perf 1M/3M/6M (barres brutes), Perf 1Y (calendaire), vol annualisée et
+    max drawdown de toutes les colonnes en une passe sur la matrice NumPy.
+    Mêmes résultats que rolling_return / calendar_return_years /
+    annualized_vol / max_drawdown, données manquantes en tête comprises.
+    """
+    if prices.empty:
+        return pd.DataFrame(index=prices.columns, columns=METRIC_COLUMNS, dtype=float)
+    if not prices.index.is_monotonic_increasing:
+        prices = prices.sort_index()
+    values = prices.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    n = values.shape[0]
+    out: Dict[str, np.ndarray] = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for name, days in METRIC_HORIZONS.items():
+            out[name] = values[-1] / values[-days] - 1.0 if n > days else np.full(values.shape[1], np.nan)
+    out["Perf 1Y"] = _calendar_return(values, valid, prices.index, 1)
+    filled = _ffill_2d(values, valid)
+    out["Vol annualisée"] = _annualized_vol(filled)
+    out["Max Drawdown"] = _max_drawdown(filled, valid)
+    return pd.DataFrame(out, index=prices.columns)[METRIC_COLUMNS]
+
+
+class IncrementalMetrics:
+    """
+    Mêmes métriques que compute_price_metrics, tenues à jour barre par barre.
+    L'état est "validé" jusqu'à l'avant-dernière barre (Welford sur les
+    rendements, pic et drawdown courants, tampon circulaire des horizons,
+    pointeurs de début 1Y) ; la dernière barre reste provisoire. Remplacer la
+    dernière barre (realtime) ou en ajouter une coûte O(tickers). Une fenêtre
+    glissante (barres de tête évincées) retire leur rendement du Welford ; le
+    pic / drawdown d'un ticker n'est recalculé que si la barre évincée
+    dépassait la suivante.
+    """
+
+    def __init__(self, prices: pd.DataFrame):
+        self.rebuild(prices)
+
+    def rebuild(self, prices: pd.DataFrame) -> None:
+        if not prices.index.is_monotonic_increasing:
+            prices = prices.sort_index()
+        self.columns = list(prices.columns)
+        values = prices.to_numpy(dtype=float)
+        m = values.shape[1]
+        committed = values[:-1]
+        valid = ~np.isnan(committed)
+        filled = _ffill_2d(committed, valid)
+        self._n = committed.shape[0]
+        self._first = values[0].copy() if len(values) else None
+        self._recent = deque(committed[-max(METRIC_HORIZONS.values()):], maxlen=max(METRIC_HORIZONS.values()))
+        self._dates: List[pd.Timestamp] = list(prices.index[:-1])
+        self._rows: List[np.ndarray] = list(committed)
+        self._offset = 0
+        self._head = 0
+        self._hist = deque(filled)
+        self._hist_dates = deque(prices.index[:-1])
+        self._start = np.zeros(m, dtype=np.int64)
+        self._filled = filled[-1].copy() if self._n else np.full(m, np.nan)
+        self._peak = np.fmax.reduce(filled, axis=0) if self._n else np.full(m, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            draw = filled / np.fmax.accumulate(filled, axis=0) - 1.0
+            rets = filled[1:] / filled[:-1] - 1.0
+        self._dd = np.where(np.isnan(draw), np.inf, draw).min(axis=0) if self._n else np.full(m, np.inf)
+        rets = rets[~np.isnan(rets).any(axis=1)]
+        self._w_n = rets.shape[0]
+        self._w_mean = rets.mean(axis=0) if self._w_n else np.zeros(m)
+        self._w_m2 = ((rets - self._w_mean) ** 2).sum(axis=0) if self._w_n else np.zeros(m)
+        self._last = values[-1].copy() if len(values) else None
+        self._last_date = prices.index[-1] if len(values) else None
+
+    def _commit_last(self) -> None:
+        row = self._last
+        filled = np.where(np.isnan(row), self._filled, row)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = filled / self._filled - 1.0
+            if not np.isnan(r).any():
+                # Welford : moyenne / somme des carrés des écarts en une passe
+                self._w_n += 1
+                delta = r - self._w_mean
+                self._w_mean = self._w_mean + delta / self._w_n
+                self._w_m2 = self._w_m2 + delta * (r - self._w_mean)
+            self._peak = np.fmax(self._peak, filled)
+            draw = filled / self._peak - 1.0
+        self._dd = np.fmin(self._dd, np.where(np.isnan(draw), np.inf, draw))
+        self._filled = filled
+        if self._first is None:
+            self._first = row.copy()
+        self._recent.append(row)
+        self._dates.append(self._last_date)
+        self._rows.append(row)
+        self._hist.append(filled)
+        self._hist_dates.append(self._last_date)
+        self._n += 1
+
+    def _evict_head(self) -> bool:
+        """Retire la barre de tête ; False si l'état doit être reconstruit."""
+        # nouvelle tête incomplète : le ffill des barres suivantes changerait
+        if self._n < 2 or np.isnan(self._hist[1]).any():
+            return False
+        old = self._hist.popleft()
+        self._hist_dates.popleft()
+        head = self._hist[0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r = head / old - 1.0
+            if not np.isnan(r).any():
+                # Welford inverse : on retire le rendement de tête
+                if self._w_n > 1:
+                    mean = (self._w_n * self._w_mean - r) / (self._w_n - 1)
+                    self._w_m2 = np.maximum(self._w_m2 - (r - mean) * (r - self._w_mean), 0.0)
+                    self._w_mean = mean
+                else:
+                    self._w_mean = np.zeros_like(self._w_mean)
+                    self._w_m2 = np.zeros_like(self._w_m2)
+                self._w_n -= 1
+            # pic / drawdown inchangés si la barre évincée ne dépassait pas la suivante
+            stale = old > head
+            if stale.any():
+                window = np.array(self._hist)[:, stale]
+                peak = np.fmax.accumulate(window, axis=0)
+                draw = window / peak - 1.0
+                self._peak[stale] = peak[-1]
+                self._dd[stale] = np.where(np.isnan(draw), np.inf, draw).min(axis=0)
+        if len(self._recent) >= self._n:
+            self._recent.popleft()
+        self._n -= 1
+        self._first = head.copy()
+        self._head += 1
+        if self._offset < self._head:
+            del self._dates[0]
+            del self._rows[0]
+            self._offset += 1
+        self._start = np.maximum(self._start, self._head)
+        return True
+
+    def append_bar(self, date: pd.Timestamp, row: np.ndarray) -> None:
+        if self._last is not None:
+            self._commit_last()
+        self._last = np.asarray(row, dtype=float).copy()
+        self._last_date = date
+
+    def replace_last(self, row: np.ndarray) -> None:
+        self._last = np.asarray(row, dtype=float).copy()
+
+    def sync(self, prices: pd.DataFrame) -> str:
+        """Aligne l'état sur `prices` : "same", "replace", "append", "slide" ou "rebuild"."""
+        if list(prices.columns) != self.columns or prices.empty or self._last is None \
+                or not prices.index.is_monotonic_increasing:
+            self.rebuild(prices)
+            return "rebuild"
+        values = prices.to_numpy(dtype=float)
+        n = self._n + 1
+        if prices.index[-1] == self._last_date:
+            appended = 0
+        elif len(values) >= 2 and prices.index[-2] == self._last_date:
+            appended = 1
+        else:
+            self.rebuild(prices)
+            return "rebuild"
+        # barres sorties de la fenêtre par la tête (filter_period_df glissant)
+        evicted = n + appended - len(values)
+        if evicted == 0:
+            head, head_date = self._first, (self._hist_dates[0] if self._n else self._last_date)
+        elif 0 < evicted < self._n:
+            head, head_date = self._hist[evicted], self._hist_dates[evicted]
+        else:
+            head, head_date = None, None
+        if head is None or prices.index[0] != head_date \
+                or not np.array_equal(values[0], head, equal_nan=True) \
+                or (n - evicted > 1 and not np.array_equal(values[-2 - appended], self._recent[-1], equal_nan=True)):
+            self.rebuild(prices)
+            return "rebuild"
+        for _ in range(evicted):
+            if not self._evict_head():
+                self.rebuild(prices)
+                return "rebuild"
+        if appended:
+            # la barre provisoire (ex. cours realtime) prend sa valeur définitive
+            self.replace_last(values[-2])
+            self.append_bar(prices.index[-1], values[-1])
+            return "slide" if evicted else "append"
+        if np.array_equal(values[-1], self._last, equal_nan=True):
+            return "slide" if evicted else "same"
+        self.replace_last(values[-1])
+        return "slide" if evicted else "replace"
+
+    def _year_start(self, target: pd.Timestamp) -> np.ndarray:
+        # pointeurs monotones : premier cours valide >= cible, par ticker
+        k = self._offset + len(self._rows)
+        p = self._start
+        while True:
+            need = np.zeros(len(p), dtype=bool)
+            for j, pj in enumerate(p):
+                if pj < k:
+                    i = pj - self._offset
+                    need[j] = self._dates[i] < target or np.isnan(self._rows[i][j])
+            if not need.any():
+                break
+            p[need] += 1
+        start = np.array([self._rows[pj - self._offset][j] if pj < k else self._last[j] for j, pj in enumerate(p)])
+        drop = int(p.min()) - self._offset
+        if drop > YEAR_BUFFER_TRIM:
+            del self._dates[:drop]
+            del self._rows[:drop]
+            self._offset += drop
+        return start
+
+    def metrics(self) -> pd.DataFrame:
+        m = len(self.columns)
+        if self._last is None:
+            return pd.DataFrame(index=self.columns, columns=METRIC_COLUMNS, dtype=float)
+        last = self._last
+        n = self._n + 1
+        out: Dict[str, np.ndarray] = {}
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for name, days in METRIC_HORIZONS.items():
+                out[name] = last / self._recent[-(days - 1)] - 1.0 if n > days else np.full(m, np.nan)
+            end = np.where(np.isnan(last), self._filled, last)
+            out["Perf 1Y"] = end / self._year_start(self._last_date - pd.DateOffset(years=1)) - 1.0
+            # rendement provisoire fusionné sans toucher à l'état validé
+            w_n, w_m2 = self._w_n, self._w_m2
+            r = end / self._filled - 1.0
+            if not np.isnan(r).any():
+                w_n += 1
+                delta = r - self._w_mean
+                w_m2 = w_m2 + delta * (r - (self._w_mean + delta / w_n))
+            if n < VOL_MIN_ROWS or w_n < 2:
+                out["Vol annualisée"] = np.full(m, np.nan)
+            else:
+                out["Vol annualisée"] = np.sqrt(w_m2 / (w_n - 1)) * np.sqrt(TRADING_DAYS)
+            peak = np.fmax(self._peak, end)
+            draw = end / peak - 1.0
+        dd = np.fmin(self._dd, np.where(np.isnan(draw), np.inf, draw))
+        out["Max Drawdown"] = np.where(np.isnan(end), np.nan, dd)
+        return pd.DataFrame(out, index=self.columns)[METRIC_COLUMNS]
+
+
+# =========================================================
+# SCORING
+# =========================================================
+SCORE_WEIGHTS = {
+    "Score Value": 0.28,
+    "Score Quality": 0.30,
+    "Score Momentum": 0.27,
+    "Score Risk": 0.15,
+}
+
+
+class FantaziaScorer:
+    """Classement d'un panier : fondamentaux + métriques de prix -> sous-scores et Fantazia Score (%)."""
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        self.weights = dict(weights or SCORE_WEIGHTS)
+
+    def rank(
+        self,
+        price_metrics: pd.DataFrame,
+        fund: pd.DataFrame,
+        benchmark_series: Optional[pd.Series] = None,
+    ) -> pd.DataFrame:
+        """Classement à partir de métriques déjà calculées (compute_price_metrics / IncrementalMetrics)."""
+        table_base = fund.copy()
+        for col in METRIC_COLUMNS:
+            table_base[col] = price_metrics[col]
+
+        pe = _numeric(table_base, "P/E (trailing)")
+        pb = _numeric(table_base, "P/B")
+        roe = _numeric(table_base, "ROE")
+        margin = _numeric(table_base, "Marge nette")
+        de = _numeric(table_base, "Dette/Capitaux")
+        mom6 = _numeric(table_base, "Perf 6M")
+        mom1y = _numeric(table_base, "Perf 1Y")
+        v = _numeric(table_base, "Vol annualisée")
+        dd = _numeric(table_base, "Max Drawdown")
+
+        value_score = (-zscore(pe).fillna(0) + -zscore(pb).fillna(0)) / 2
+        quality_score = (zscore(roe).fillna(0) + zscore(margin).fillna(0) + -zscore(de).fillna(0)) / 3
+        momentum_score = (zscore(mom6).fillna(0) + zscore(mom1y).fillna(0)) / 2
+        risk_score = (-zscore(v).fillna(0) + zscore(dd).fillna(0)) / 2
+
+        table_base["Score Value"] = value_score
+        table_base["Score Quality"] = quality_score
+        table_base["Score Momentum"] = momentum_score
+        table_base["Score Risk"] = risk_score
+
+        table_base["Score Global"] = sum(w * table_base[col] for col, w in self.weights.items())
+
+        ranked_all = table_base.copy()
+        if "Market Cap" in ranked_all.columns:
+            ranked_all["Market Cap (Mds)"] = ranked_all["Market Cap"].apply(
+                lambda x: x / 1e9 if pd.notna(x) else np.nan
+            )
+        score_min = ranked_all["Score Global"].min()
+        score_max = ranked_all["Score Global"].max()
+
+        if pd.isna(score_min) or pd.isna(score_max) or score_min == score_max:
+            ranked_all["Fantazia Score (%)"] = 50.0
+        else:
+            ranked_all["Fantazia Score (%)"] = (
+                (ranked_all["Score Global"] - score_min) / (score_max - score_min) * 100.0
+            )
+
+        # Surperformance vs benchmark (1Y) si disponible
+        if benchmark_series is not None and not benchmark_series.empty:
+            bm_df = pd.DataFrame({"BM": benchmark_series})
+            bm_1y = calendar_return_years(bm_df, years=1)
+            bm_1y_val = bm_1y.get("BM", np.nan)
+            if not pd.isna(bm_1y_val):
+                ranked_all["Surperf 1Y vs BM (pts)"] = (ranked_all["Perf 1Y"] - bm_1y_val) * 100.0
+            else:
+                ranked_all["Surperf 1Y vs BM (pts)"] = np.nan
+        else:
+            ranked_all["Surperf 1Y vs BM (pts)"] = np.nan
+        return ranked_all
+
+    def score(
+        self,
+        prices: pd.DataFrame,
+        fund: Optional[pd.DataFrame] = None,
+        benchmark_series: Optional[pd.Series] = None,
+    ) -> pd.DataFrame:
+        """Classement d'un panier depuis sa matrice de prix (une colonne par ticker)."""
+        fund = pd.DataFrame(index=prices.columns) if fund is None else fund.reindex(prices.columns)
+        return self.rank(compute_price_metrics(prices), fund, benchmark_series)
+
+    def score_many(
+        self,
+        baskets: Dict[str, List[str]],
+        prices: pd.DataFrame,
+        fund: Optional[pd.DataFrame] = None,
+        benchmark_series: Optional[pd.Series] = None,
+    ) -> Dict[str, pd.DataFrame]:
+        """
+        Plusieurs paniers en un appel, sur une matrice de prix commune (union
+        des tickers). Chaque panier garde ses propres dates : les résultats
+        sont ceux de `score` sur le panier seul.
+        """
+        out: Dict[str, pd.DataFrame] = {}
+        for name, tickers in baskets.items():
+            cols = [t for t in tickers if t in prices.columns]
+            sub = prices[cols].dropna(how="all")
+            sub_fund = None if fund is None else fund.reindex(cols)
+            out[name] = self.score(sub, sub_fund, benchmark_series)
+        return out